@@ -1,19 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
-from database import get_session, Search, WebPage, create_tables
-from search import get_gemini_response, search_duckduckgo, perform_deep_search
+from flask import Flask, render_template, request, redirect, url_for, send_from_directory, jsonify, Response, stream_with_context, g
+from database import get_session, Search, WebPage, Message, create_tables
+from search import get_gemini_response, stream_gemini_response, search_duckduckgo, perform_deep_search, answer_with_search_results
+from browser_pool import resolve_chromedriver
+from jobs import get_job_runner, JobQueueFull
+from gemini_client import reset_gemini_client
+from retrieval import retrieve_passages, format_passages
+from conversation import append_message, load_messages, build_conversation_context
 import os
-import markdown  # ensure this is imported
+from rendering import render_markdown
+from metrics import registry, HTTP_REQUEST_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE
 import json
+import secrets
+import threading
+import time
 
 app = Flask(__name__)
 
 @app.template_filter('convert_markdown')
 def convert_markdown(text):
-    """Convert markdown text to HTML using desired extensions."""
-    return markdown.markdown(
-        text,
-        extensions=['extra', 'fenced_code', 'codehilite', 'smarty', 'nl2br']
-    )
+    """Convert markdown text to HTML; results are cached by content hash (see rendering.py)."""
+    return render_markdown(text)
 
 # Функція для отримання API ключа з різних джерел
 def get_api_key():
@@ -35,6 +41,48 @@ def get_api_key():
 # Get API key from environment or config file
 GOOGLE_API_KEY = get_api_key()
 
+# Генерацію відповіді запускає лише GET /stream з одноразовим токеном, виданим POST /search
+# або /ask, а не будь-який GET (попереднє завантаження сторінки, повторне підключення)
+STREAM_TOKEN_TTL = int(os.environ.get('DEEPSCOUT_STREAM_TOKEN_TTL', 10 * 60))
+_stream_tokens = {}  # токен -> (search_id, id питання, час видачі)
+_stream_tokens_lock = threading.Lock()
+
+def issue_stream_url(search_id, question_id):
+    """URL потоку відповіді на питання question_id з новим одноразовим токеном."""
+    token = secrets.token_urlsafe(16)
+    now = time.monotonic()
+    with _stream_tokens_lock:
+        # Токени потоків, до яких клієнт так і не підключився, прибираємо тут же
+        for expired in [key for key, (_, _, issued) in _stream_tokens.items() if now - issued > STREAM_TOKEN_TTL]:
+            del _stream_tokens[expired]
+        _stream_tokens[token] = (search_id, question_id, now)
+    return url_for('stream_answer', search_id=search_id, token=token)
+
+def claim_stream_token(token, search_id, question_id):
+    """Використовує токен; True, якщо він виданий саме для цього питання і ще не використаний."""
+    with _stream_tokens_lock:
+        entry = _stream_tokens.pop(token, None)
+    return entry is not None and entry[:2] == (search_id, question_id) \
+        and time.monotonic() - entry[2] <= STREAM_TOKEN_TTL
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    # Для потокових відповідей (SSE) це час до початку потоку, а не до його завершення
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unknown',
+                                     method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Метрики у текстовому форматі Prometheus."""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -45,9 +93,35 @@ def search():
     search_type = request.form.get('search_type', 'shallow')
     session = get_session()
 
-    if search_type == 'shallow':
-        gemini_response = get_gemini_response(query, GOOGLE_API_KEY, detailed=True)
-        search_results = search_duckduckgo(query)
+    if search_type == 'shallow' and request.form.get('stream') == '1':
+        # Відповідь Gemini прийде потоком через /stream/<search_id> і там же збережеться,
+        # а видачу клієнт завантажує окремо (/search/results) паралельно з потоком
+        chat_history = [{
+            "role": "user",
+            "content": query
+        }]
+        new_search = Search(
+            query=query, 
+            search_type=search_type
+        )
+        session.add(new_search)
+        session.flush()
+        question_message = append_message(session, new_search.id, "user", query)
+        session.commit()
+        search_id = new_search.id
+        stream_url = issue_stream_url(search_id, question_message.id)
+        session.close()
+        
+        return render_template('response_section.html', 
+                             search_type=search_type, 
+                             user_query=query,
+                             search_id=search_id,
+                             chat_history=chat_history,
+                             stream_url=stream_url,
+                             results_url=url_for('search_results_fragment', q=query))
+    elif search_type == 'shallow':
+        # Відповідь Gemini і видача DuckDuckGo отримуються паралельно
+        gemini_response, search_results = answer_with_search_results(query, query, GOOGLE_API_KEY)
         
         # Create a chat history with the first Q&A pair
         chat_history = [{
@@ -55,17 +129,20 @@ def search():
             "content": query
         }, {
             "role": "assistant",
-            "content": gemini_response
+            "content": gemini_response,
+            "html": render_markdown(gemini_response)
         }]
         
-        # Store the chat history as JSON in the database
+        # Зберігаємо пошук і перші повідомлення розмови
         new_search = Search(
             query=query, 
-            search_type=search_type, 
-            response=gemini_response, 
-            chat_history=json.dumps(chat_history)
+            search_type=search_type
         )
+        new_search.set_response(gemini_response)
         session.add(new_search)
+        session.flush()
+        for message in chat_history:
+            append_message(session, new_search.id, message["role"], message["content"])
         session.commit()
         search_id = new_search.id
         session.close()
@@ -74,129 +151,140 @@ def search():
         return render_template('response_section.html', 
                              search_type=search_type, 
                              gemini_response=gemini_response, 
+                             gemini_response_html=chat_history[-1]["html"],
                              search_results=search_results, 
                              user_query=query,
                              search_id=search_id,
                              chat_history=chat_history)
     elif search_type == 'deep':
-        # Запускаємо глибокий пошук і отримуємо ID пошуку
-        search_id = perform_deep_search(query, GOOGLE_API_KEY, session)
-        
-        # Отримуємо нову сесію, щоб запобігти проблемам з від'єднаними об'єктами
-        session = get_session() 
-        search_entry = session.query(Search).get(search_id)
-        
-        if not search_entry:
-            session.close()
-            print(f"КРИТИЧНА ПОМИЛКА: Запис пошуку з ID {search_id} не знайдено.")
-            return render_template('index.html', error_message="Помилка: Дані глибокого пошуку не вдалося отримати.")
-
-        # Отримуємо контент відповіді
-        response_content = "Глибокий пошук не зміг згенерувати відповідь. Це може бути через проблеми зі збором даних з сайтів."
-        try:
-            session.refresh(search_entry)
-            if search_entry.response is not None:
-                response_content = search_entry.response
-        except Exception as e:
-            print(f"ПОМИЛКА: Не вдалося оновити чи отримати search_entry.response для ID {search_id}: {e}")
-        
-        # Отримуємо всі сторінки і зберігаємо лише необхідні атрибути в список словників
-        # Цей підхід вирішує проблему відірваних об'єктів, оскільки ми працюємо з простими типами даних
-        pages_data = []
+        session.close()
+        # Глибокий пошук триває хвилинами, тому виконуємо його у фоновому завданні,
+        # а клієнт опитує /search/status/<job_id>
         try:
-            raw_pages = session.query(WebPage).filter(WebPage.search_id == search_id).all()
-            for page in raw_pages:
-                try:
-                    # Витягуємо всі необхідні атрибути зараз, поки об'єкт прикріплений до сесії
-                    pages_data.append({
-                        'url': page.url,
-                        'title': page.title or 'Сторінка без назви',
-                        'icon_url': page.icon_url or '/static/default-favicon.png',
-                        'content': page.content
-                    })
-                except Exception as page_error:
-                    print(f"ПОМИЛКА при обробці сторінки: {page_error}")
-        except Exception as pages_error:
-            print(f"ПОМИЛКА при отриманні сторінок: {pages_error}")
-        
-        # Створюємо історію чату
-        chat_history = [{
-            "role": "user",
-            "content": query
-        }, {
-            "role": "assistant",
-            "content": response_content
-        }]
+            job = get_job_runner().submit('deep_search', run_deep_search_job, query, GOOGLE_API_KEY)
+        except JobQueueFull as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({
+            'job_id': job.id,
+            'status_url': url_for('search_status', job_id=job.id)
+        }), 202
+    return "Невідомий тип пошуку."
+
+def run_deep_search_job(job, query, api_key):
+    """Фонове завдання глибокого пошуку. Повертає ID запису пошуку."""
+    session = get_session()
+    try:
+        search_id = perform_deep_search(query, api_key, session, progress=job.update)
         
-        # Оновлюємо запис у БД
-        search_entry.chat_history = json.dumps(chat_history)
+        search_entry = session.query(Search).get(search_id)
+        # Перша пара розмови: запит і звіт
+        append_message(session, search_id, "user", query)
+        append_message(session, search_id, "assistant", search_entry.response)
         session.commit()
+        return search_id
+    finally:
         session.close()
-        
-        # Повертаємо шаблон з даними
-        return render_template('response_section.html', 
-                            search_type=search_type, 
-                            gemini_report=response_content, 
-                            pages=pages_data,  # Тепер це список словників, а не об'єктів SQLAlchemy
-                            search_id=search_id,
-                            user_query=query,
-                            chat_history=chat_history)
-    return "Невідомий тип пошуку."
 
-@app.route('/ask', methods=['POST'])
-def ask_question():
-    search_id = request.form['search_id']
-    question = request.form['question']
-    search_type = request.form.get('search_type', 'deep')  # Default to deep if not specified
+@app.route('/search/results')
+def search_results_fragment():
+    """
+    Видача DuckDuckGo окремим запитом: потокова відповідь Gemini стартує одразу,
+    не чекаючи на пошук, а клієнт вставляє цей фрагмент, коли він готовий.
+    """
+    query = request.args.get('q', '').strip()
+    return render_template('search_results.html', search_results=search_duckduckgo(query) if query else [])
 
-    print(f"DEBUG: Received follow-up question: '{question}' for search_id: {search_id}, search_type: {search_type}")
+@app.route('/search/status/<job_id>')
+def search_status(job_id):
+    job = get_job_runner().get(job_id)
+    if not job:
+        return jsonify({'error': 'Завдання не знайдено'}), 404
+    status = job.to_dict()
+    if job.status == 'done':
+        status['result_url'] = url_for('search_result', search_id=job.result)
+    return jsonify(status)
+
+@app.route('/search/timings/<int:search_id>')
+def search_timings(search_id):
+    """
+    Розбивка часу глибокого пошуку по етапах і використання бюджету завантаження (budget),
+    збережені разом із записом пошуку.
+    """
+    session = get_session()
+    try:
+        search_entry = session.query(Search).get(search_id)
+        if not search_entry:
+            return jsonify({'error': 'Пошук не знайдено'}), 404
+        timings = json.loads(search_entry.timings) if search_entry.timings else {}
+        if search_entry.crawl_budget:
+            timings['budget'] = json.loads(search_entry.crawl_budget)
+        return jsonify(timings)
+    finally:
+        session.close()
 
+@app.route('/search/result/<int:search_id>')
+def search_result(search_id):
     session = get_session()
     search_entry = session.query(Search).get(search_id)
     
     if not search_entry:
         session.close()
-        return "Помилка: Пошук не знайдено."
+        print(f"КРИТИЧНА ПОМИЛКА: Запис пошуку з ID {search_id} не знайдено.")
+        return render_template('index.html', error_message="Помилка: Дані глибокого пошуку не вдалося отримати.")
+
+    # Отримуємо контент відповіді
+    response_content = search_entry.response or "Глибокий пошук не зміг згенерувати відповідь. Це може бути через проблеми зі збором даних з сайтів."
     
-    # Load the existing chat history
-    chat_history = json.loads(search_entry.chat_history) if search_entry.chat_history else []
+    # Отримуємо сторінки як список словників (без вмісту), щоб не мати справи з відірваними об'єктами
+    pages_data = load_page_links(session, search_id)
     
-    # Extract all questions and answers in a clear format for context
-    conversation_context = ""
-    for i in range(0, len(chat_history), 2):
-        if i+1 < len(chat_history):
-            user_q = chat_history[i]['content']
-            ai_a = chat_history[i+1]['content']
-            conversation_context += f"Запитання: {user_q}\nВідповідь: {ai_a}\n\n"
+    chat_history = load_messages(session, search_entry)
+    query = search_entry.query
+    response_html = search_entry.response_html if search_entry.response else None
+    session.close()
     
-    if GOOGLE_API_KEY:
-        if search_type == 'deep':
-            # Отримуємо веб-сторінки та витягуємо їх дані одразу
-            pages_data = []
-            
-            try:
-                raw_pages = session.query(WebPage).filter(WebPage.search_id == search_id).all()
-                for page in raw_pages:
-                    try:
-                        # Витягуємо всі необхідні атрибути зараз, поки об'єкт прикріплений до сесії
-                        pages_data.append({
-                            'url': page.url,
-                            'title': page.title or 'Сторінка без назви',
-                            'icon_url': page.icon_url or '/static/default-favicon.png',
-                            'content': page.content or ''
-                        })
-                    except Exception as page_error:
-                        print(f"ПОМИЛКА при обробці сторінки в блоці else: {page_error}")
-            except Exception as pages_error:
-                print(f"ПОМИЛКА при отриманні сторінок в блоці else: {pages_error}")
-            
-            # Generate a detailed response for deep search follow-up question
-            print(f"DEBUG: Processing deep search follow-up question: {question}")
-            prompt = f"""Це додаткове питання до нашої розмови про {search_entry.query}: "{question}"
+    # Повертаємо шаблон з даними
+    return render_template('response_section.html', 
+                        search_type='deep', 
+                        gemini_report=response_content, 
+                        gemini_report_html=response_html,
+                        pages=pages_data,  # Тепер це список словників, а не об'єктів SQLAlchemy
+                        search_id=search_id,
+                        user_query=query,
+                        chat_history=chat_history)
+
+def load_page_links(session, search_id):
+    """Сторінки пошуку для списку джерел: лише URL, назва та іконка, без вмісту."""
+    pages_data = []
+    try:
+        rows = session.query(WebPage.url, WebPage.title, WebPage.icon_url) \
+                      .filter(WebPage.search_id == search_id).all()
+        for row in rows:
+            pages_data.append({
+                'url': row.url,
+                'title': row.title or 'Сторінка без назви',
+                'icon_url': row.icon_url or '/static/default-favicon.png'
+            })
+    except Exception as pages_error:
+        print(f"ПОМИЛКА при отриманні сторінок: {pages_error}")
+    return pages_data
+
+def build_sources_context(session, search_id, question):
+    """Уривки з проаналізованих джерел, що найкраще відповідають питанню (FTS5)."""
+    return format_passages(retrieve_passages(session, search_id, question))
+
+def build_followup_prompt(topic, question, conversation_context, search_type, sources_context=""):
+    """Промпт для додаткового питання в режимі глибокого або звичайного пошуку."""
+    if search_type == 'deep':
+        # Generate a detailed response for deep search follow-up question
+        return f"""Це додаткове питання до нашої розмови про {topic}: "{question}"
 
             Попередня розмова:
             {conversation_context}
             
+            Уривки з проаналізованих джерел:
+            {sources_context or "Немає релевантних уривків."}
+            
             Інструкції:
             1. Відповідай мовою запитання
             2. Надай детальну, ґрунтовну та інформативну відповідь
@@ -206,29 +294,9 @@ def ask_question():
             6. Надавай приклади, порівняння та детальні пояснення
             7. Не використовуй фрази типу "Згідно з джерелами" або "Як я вже згадував"
             """
-            
-            gemini_answer = get_gemini_response(prompt, GOOGLE_API_KEY, detailed=True)
-            
-            # Update chat history with the new Q&A pair
-            chat_history.append({"role": "user", "content": question})
-            chat_history.append({"role": "assistant", "content": gemini_answer})
-            search_entry.chat_history = json.dumps(chat_history)
-            session.commit()
-            
-            # Prepare template variables
-            template_vars = {
-                'search_type': 'deep',
-                'gemini_report': search_entry.response,
-                'pages': pages_data,  # Тепер використовується список словників
-                'gemini_answer': gemini_answer,
-                'user_question': question,
-                'search_id': search_id,
-                'user_query': search_entry.query,
-                'chat_history': chat_history            }
-            
-        else:  # shallow search
-            # Improved shallow follow-up question prompt with better context
-            prompt = f"""Це додаткове питання до нашої розмови: "{question}"
+    
+    # Improved shallow follow-up question prompt with better context
+    return f"""Це додаткове питання до нашої розмови: "{question}"
 
             Попередня розмова:
             {conversation_context}
@@ -242,29 +310,184 @@ def ask_question():
             6. Структуруй відповідь для кращого розуміння, використовуй форматування
             7. Надавай приклади та пояснення, де це доречно
             """
-            
-            print(f"DEBUG: Sending prompt to Gemini (shallow): {prompt[:200]}...")
-            gemini_answer = get_gemini_response(prompt, GOOGLE_API_KEY, detailed=True)
-            print(f"DEBUG: Received Gemini response (shallow): {gemini_answer[:200]}...")
-            search_results = search_duckduckgo(question)
-            
-            # Update chat history with the new Q&A pair
-            chat_history.append({"role": "user", "content": question})
-            chat_history.append({"role": "assistant", "content": gemini_answer})
-            search_entry.chat_history = json.dumps(chat_history)
+
+def sse_event(data, event=None):
+    """Форматує подію Server-Sent Events з JSON даними."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/stream/<int:search_id>')
+def stream_answer(search_id):
+    """
+    SSE потік відповіді Gemini на останнє питання в історії чату, яке ще не має відповіді.
+    Частини тексту йдуть як звичайні події, в кінці - подія done з готовим HTML.
+    Повна відповідь зберігається в messages (і в Search.response для першого питання).
+    Генерація починається лише з одноразовим токеном (issue_stream_url). Якщо Gemini
+    повернув помилку, замість done надсилається подія failed і нічого не зберігається:
+    питання лишається без відповіді, і в контекст розмови воно не потрапляє.
+    """
+    session = get_session()
+    search_entry = session.query(Search).get(search_id)
+    if not search_entry:
+        session.close()
+        return jsonify({'error': 'Пошук не знайдено'}), 404
+    
+    chat_history = load_messages(session, search_entry)
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    
+    if not chat_history or chat_history[-1]['role'] != 'user':
+        # Немає питання без відповіді (наприклад, повторне підключення) - віддаємо останню відповідь
+        if chat_history:
+            last_html = chat_history[-1]['html'] or convert_markdown(chat_history[-1]['content'])
+        else:
+            last_html = search_entry.response_html or convert_markdown(search_entry.response or '')
+        session.close()
+        return Response(sse_event({'html': last_html}, 'done'),
+                        mimetype='text/event-stream', headers=headers)
+    
+    question_id = chat_history[-1]['id']
+    if not claim_stream_token(request.args.get('token', ''), search_id, question_id):
+        session.close()
+        return jsonify({'error': 'Посилання на потік недійсне або вже використане'}), 409
+    
+    question = chat_history[-1]['content']
+    is_initial = len(chat_history) == 1
+    if is_initial:
+        prompt = question
+    else:
+        sources_context = ""
+        if search_entry.search_type == 'deep':
+            sources_context = build_sources_context(session, search_id, question)
+        prompt = build_followup_prompt(search_entry.query, question,
+                                       build_conversation_context(session, search_id, chat_history[:-1], GOOGLE_API_KEY),
+                                       search_entry.search_type, sources_context)
+    session.close()
+    
+    def generate():
+        parts = []
+        failed = False
+        chunks = stream_gemini_response(prompt, GOOGLE_API_KEY, detailed=True)
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event({'text': chunk})
+        except GeneratorExit:
+            # Клієнт відключився посеред потоку: дочитуємо відповідь без надсилання,
+            # щоб зберегти її повністю, а не обрізаною
+            try:
+                parts.extend(chunks)
+            except Exception:
+                failed = True
+            raise
+        except Exception:
+            failed = True
+        finally:
+            # Відповідь, обірвану помилкою Gemini, не зберігаємо
+            if not failed:
+                save_streamed_answer(search_id, question_id, ''.join(parts).strip(), is_initial)
+        if failed:
+            yield sse_event({'error': 'Не вдалося отримати відповідь від Gemini. Спробуйте ще раз.'}, 'failed')
+            return
+        yield sse_event({'html': convert_markdown(''.join(parts).strip())}, 'done')
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+def save_streamed_answer(search_id, question_id, answer, is_initial):
+    """Зберігає відповідь, лише якщо питання question_id досі останнє в розмові."""
+    session = get_session()
+    try:
+        search_entry = session.query(Search).get(search_id)
+        last_message = session.query(Message.id).filter(Message.search_id == search_id) \
+                              .order_by(Message.id.desc()).first()
+        if last_message and last_message.id == question_id:
+            append_message(session, search_id, "assistant", answer)
+            if is_initial:
+                search_entry.set_response(answer)
             session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"ПОМИЛКА при збереженні потокової відповіді для {search_id}: {e}")
+    finally:
+        session.close()
+
+@app.route('/ask', methods=['POST'])
+def ask_question():
+    search_id = request.form['search_id']
+    question = request.form['question']
+    search_type = request.form.get('search_type', 'deep')  # Default to deep if not specified
+
+    print(f"DEBUG: Received follow-up question: '{question}' for search_id: {search_id}, search_type: {search_type}")
+
+    session = get_session()
+    search_entry = session.query(Search).get(search_id)
+    
+    if not search_entry:
+        session.close()
+        return "Помилка: Пошук не знайдено."
+    
+    # Load the existing chat history
+    chat_history = load_messages(session, search_entry)
+    
+    # Клієнт з JavaScript просить потокову відповідь через /stream/<search_id>
+    stream = request.form.get('stream') == '1'
+    
+    if GOOGLE_API_KEY:
+        if search_type == 'deep':
+            # Для списку джерел потрібні лише назва, URL та іконка - вміст сторінок не завантажуємо
+            pages_data = load_page_links(session, search_id)
             
-            # Prepare template variables
+            print(f"DEBUG: Processing deep search follow-up question: {question}")
+            template_vars = {
+                'search_type': 'deep',
+                'gemini_report': search_entry.response,
+                'gemini_report_html': search_entry.response_html,
+                'pages': pages_data  # Тепер використовується список словників
+            }
+        else:  # shallow search
+            # Видачу не чекаємо: з потоком клієнт завантажує її окремо (/search/results),
+            # без потоку вона отримується нижче паралельно з відповіддю Gemini
             template_vars = {
                 'search_type': 'shallow',
                 'gemini_response': search_entry.response,
-                'search_results': search_results,
-                'gemini_answer': gemini_answer,
-                'user_question': question,
-                'search_id': search_id,
-                'user_query': search_entry.query,
-                'chat_history': chat_history
+                'gemini_response_html': search_entry.response_html,
+                'search_results': None
             }
+            if stream:
+                template_vars['results_url'] = url_for('search_results_fragment', q=question)
+        
+        if not stream:
+            # Останні репліки дослівно, старіші - у вигляді підсумку
+            conversation_context = build_conversation_context(session, search_entry.id, chat_history, GOOGLE_API_KEY)
+            sources_context = build_sources_context(session, search_id, question) if search_type == 'deep' else ""
+            prompt = build_followup_prompt(search_entry.query, question, conversation_context, search_type, sources_context)
+            print(f"DEBUG: Sending prompt to Gemini ({search_type}): {prompt[:200]}...")
+            if search_type == 'deep':
+                gemini_answer = get_gemini_response(prompt, GOOGLE_API_KEY, detailed=True)
+            else:
+                # Для звичайного пошуку відповідь і нова видача отримуються паралельно
+                gemini_answer, template_vars['search_results'] = answer_with_search_results(prompt, question, GOOGLE_API_KEY)
+            template_vars['gemini_answer'] = gemini_answer
+            template_vars['gemini_answer_html'] = render_markdown(gemini_answer)
+        
+        # Дописуємо нові повідомлення, не переписуючи всю історію
+        chat_history.append({"role": "user", "content": question})
+        question_message = append_message(session, search_entry.id, "user", question)
+        if not stream:
+            chat_history.append({"role": "assistant", "content": gemini_answer,
+                                 "html": template_vars['gemini_answer_html']})
+            append_message(session, search_entry.id, "assistant", gemini_answer)
+        session.commit()
+        if stream:
+            # Відповідь допишеться в історію, коли завершиться потік
+            template_vars['stream_url'] = issue_stream_url(search_entry.id, question_message.id)
+        
+        # Prepare template variables
+        template_vars.update({
+            'user_question': question,
+            'search_id': search_id,
+            'user_query': search_entry.query,
+            'chat_history': chat_history
+        })
     else:
         gemini_answer = "Помилка: Не налаштовано API key для Gemini."
         template_vars = {
@@ -277,18 +500,9 @@ def ask_question():
         }
         
         if search_type == 'deep':
-            pages = session.query(WebPage).filter(WebPage.search_id == search_id).all()
-            
-            # Refresh each page object to ensure they are attached to the session
-            for page in pages:
-                try:
-                    session.refresh(page)
-                except Exception as e:
-                    print(f"ERROR: Could not refresh page object with ID {page.id if hasattr(page, 'id') else 'Unknown'} in else block: {e}")
-                    
             template_vars.update({
                 'gemini_report': search_entry.response,
-                'pages': pages
+                'pages': load_page_links(session, search_id)
             })
         else:
             search_results = search_duckduckgo(question)
@@ -316,6 +530,7 @@ def save_settings():
     if api_key:
         # Оновлюємо змінну API ключа в поточній сесії
         GOOGLE_API_KEY = api_key
+        reset_gemini_client()
         
         # Зберігаємо API ключ в файл конфігурації для майбутніх запусків
         try:
@@ -332,6 +547,7 @@ def save_settings():
     else:
         # Якщо ключ порожній, очищаємо його
         GOOGLE_API_KEY = None
+        reset_gemini_client()
         
         # Видаляємо файл конфігурації, якщо він існує
         config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'api_key.txt')
@@ -345,7 +561,8 @@ def static_files(filename):
     return send_from_directory('static', filename)
 
 if __name__ == '__main__':
-    import os
-    if not os.path.exists('deepscout.db'):
-        create_tables()  # Create tables if DB doesn't exist
+    # Створює відсутні таблиці і застосовує міграції до існуючої БД
+    create_tables()
+    # Визначаємо chromedriver один раз при старті, а не в кожному запиті
+    resolve_chromedriver()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Офлайн наскрізний бенчмарк пошукового конвеєра.
+
+Піднімає локальний HTTP сервер (видача DuckDuckGo + сторінки статей) і фейковий Gemini
+(benchmarks/offline_env.py), після чого вимірює:
+- perform_deep_search по етапах (sub_queries, serp, pages, store, report) і загалом;
+- час завантаження і витягування тексту сторінок (сумарно по потоках);
+- пропускну здатність при N одночасних глибоких пошуках;
+- маршрути /search (звичайний і глибокий через фонове завдання) та /ask;
+- пік RSS процесу.
+Результат - JSON у stdout (або у файл --output), щоб порівнювати між комітами;
+весь інший вивід застосунку під час прогону перенаправляється в stderr.
+
+Запуск з кореня проєкту:
+    python benchmarks/e2e_benchmark.py --runs 5 --concurrency 4 --latency-ms 50 --page-kb 20
+
+Мережа і Chrome не потрібні: резервне завантаження через Selenium вимкнено,
+БД - тимчасовий файл SQLite, кеш відповідей Gemini не зберігається на диск.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='послідовних глибоких пошуків для таймінгів етапів')
+    parser.add_argument('--concurrency', type=int, default=4, help='одночасних глибоких пошуків для пропускної здатності')
+    parser.add_argument('--route-runs', type=int, default=5, help='запитів на кожен маршрут Flask')
+    parser.add_argument('--latency-ms', type=float, default=50, help='затримка відповіді сторінки статті')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='розкид затримки')
+    parser.add_argument('--serp-latency-ms', type=float, default=100, help='затримка сторінки видачі')
+    parser.add_argument('--page-kb', type=float, default=20, help='розмір сторінки статті')
+    parser.add_argument('--results-per-serp', type=int, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='частка статей, що відповідають 404')
+    parser.add_argument('--gemini-latency-ms', type=float, default=300, help='затримка фейкового Gemini')
+    parser.add_argument('--output', help='записати JSON у файл замість stdout')
+    return parser.parse_args()
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': round(statistics.mean(values), 4),
+        'p50': round(values[len(values) // 2], 4),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+        'max': round(values[-1], 4),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class FetchStats:
+    """Сумарний час завантаження і витягування тексту по всіх потоках завантаження."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pages = 0
+        self.bytes = 0
+        self.fetch_seconds = []
+        self.extract_seconds = []
+
+    def instrument(self, search_module, utils_module):
+        original_process_page = search_module.process_page
+        original_extract_stream = utils_module.extract_stream
+        local = threading.local()
+
+        def timed_extract_stream(chunks, url=None, encoding=None, parser=None):
+            # Тіло спершу дочитуємо, щоб відокремити час мережі від часу розбору
+            body = b''.join(chunks)
+            downloaded = time.perf_counter()
+            result = original_extract_stream([body], url, encoding, parser)
+            local.extract = time.perf_counter() - downloaded
+            with self.lock:
+                self.bytes += len(body)
+            return result
+
+        def timed_process_page(url, **kwargs):
+            local.extract = 0.0
+            started = time.perf_counter()
+            completed = False
+            try:
+                page = original_process_page(url, **kwargs)
+                completed = True
+                return page
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    # Сторінки, де process_page впав, не рахуються завантаженими
+                    self.pages += completed
+                    self.extract_seconds.append(local.extract)
+                    self.fetch_seconds.append(elapsed - local.extract)
+
+        search_module.process_page = timed_process_page
+        utils_module.extract_stream = timed_extract_stream
+
+    def require_pages(self, phase):
+        """Зламаний конвеєр інакше дає правдоподібний JSON з нулями - зупиняємось з помилкою."""
+        with self.lock:
+            pages, received = self.pages, self.bytes
+        if not pages or not received:
+            sys.exit(f"Бенчмарк недійсний ({phase}): завантажено сторінок {pages}, байт {received}")
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'pages': self.pages,
+                'bytes': self.bytes,
+                'fetch_seconds': summarize(self.fetch_seconds),
+                'extract_seconds': summarize(self.extract_seconds),
+                'fetch_seconds_total': round(sum(self.fetch_seconds), 4),
+                'extract_seconds_total': round(sum(self.extract_seconds), 4),
+            }
+
+class StageTimer:
+    """Колбек progress для perform_deep_search: фіксує момент початку кожного етапу."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_starts = {}
+
+    def __call__(self, stage, **details):
+        self.stage_starts.setdefault(stage, time.perf_counter())
+
+    def finish(self):
+        finished = time.perf_counter()
+        ordered = sorted(self.stage_starts.items(), key=lambda item: item[1])
+        durations = {}
+        for (stage, start), following in zip(ordered, ordered[1:] + [(None, finished)]):
+            durations[stage] = following[1] - start
+        durations['total'] = finished - self.started
+        return durations
+
+def main():
+    args = parse_args()
+    # Застосунок друкує діагностику в stdout; у stdout має потрапити лише JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='deepscout-bench-')
+    # Налаштування застосунку читаються при імпорті модулів, тому задаємо їх до імпорту
+    os.environ['DEEPSCOUT_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DEEPSCOUT_GEMINI_CACHE_PERSIST'] = '0'
+    os.environ['DEEPSCOUT_SEARCH_BACKENDS'] = 'html'
+
+    from offline_env import OfflineWeb, FakeGeminiClient
+    import database
+    import search
+    import utils
+    from gemini_client import set_gemini_client, response_cache
+    from search_backends import set_search_backends, DuckDuckGoHTMLBackend
+
+    web = OfflineWeb(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                     page_bytes=int(args.page_kb * 1024), results_per_serp=args.results_per_serp,
+                     error_rate=args.error_rate, serp_latency=args.serp_latency_ms / 1000).start()
+    gemini = FakeGeminiClient(latency=args.gemini_latency_ms / 1000)
+    set_gemini_client(gemini)
+    set_search_backends([DuckDuckGoHTMLBackend(web.serp_url)])
+
+    def no_selenium(url):
+        raise RuntimeError("Selenium вимкнено в офлайн-бенчмарку")
+    utils.get_selenium_page_source = no_selenium
+
+    database.create_tables()
+    fetch_stats = FetchStats()
+    fetch_stats.instrument(search, utils)
+
+    def deep_search(query):
+        # Унікальний запит: інакше спрацюють кеш сторінок і кеш відповідей Gemini
+        query = f"{query} {uuid.uuid4().hex[:8]}"
+        timer = StageTimer()
+        session = database.get_session()
+        try:
+            search.perform_deep_search(query, gemini.api_key, session, progress=timer)
+        finally:
+            session.close()
+        return timer.finish()
+
+    result = {
+        'revision': git_revision(),
+        'config': vars(args),
+    }
+
+    # 1. Послідовні глибокі пошуки: таймінги етапів
+    stage_runs = [deep_search('offline benchmark') for _ in range(args.runs)]
+    fetch_stats.require_pages('послідовні пошуки')
+    stages = sorted({stage for run in stage_runs for stage in run})
+    result['deep_search'] = {
+        'stages': {stage: summarize([run[stage] for run in stage_runs if stage in run]) for stage in stages},
+        'fetch': fetch_stats.to_dict(),
+    }
+
+    # 2. Пропускна здатність: N одночасних пошуків
+    fetch_stats.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        concurrent_runs = list(executor.map(deep_search, [f"concurrent {i}" for i in range(args.concurrency)]))
+    wall = time.perf_counter() - started
+    fetch_stats.require_pages('одночасні пошуки')
+    result['concurrency'] = {
+        'searches': args.concurrency,
+        'wall_seconds': round(wall, 4),
+        'searches_per_minute': round(args.concurrency / wall * 60, 2),
+        'latency': summarize([run['total'] for run in concurrent_runs]),
+        'fetch': fetch_stats.to_dict(),
+    }
+
+    # 3. Маршрути Flask
+    import app as app_module
+    app_module.GOOGLE_API_KEY = gemini.api_key
+    client = app_module.app.test_client()
+    routes = {'search_shallow': [], 'ask_shallow': [], 'search_deep_job': [], 'ask_deep': []}
+    for i in range(args.route_runs):
+        response_cache._entries.clear()
+        started = time.perf_counter()
+        response = client.post('/search', data={'query': f'route shallow {i} {uuid.uuid4().hex[:6]}', 'search_type': 'shallow'})
+        routes['search_shallow'].append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        with database.get_session() as session:
+            shallow_id = session.query(database.Search.id).order_by(database.Search.id.desc()).first()[0]
+
+        started = time.perf_counter()
+        client.post('/ask', data={'search_id': shallow_id, 'question': f'follow-up {i}', 'search_type': 'shallow'})
+        routes['ask_shallow'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        response = client.post('/search', data={'query': f'route deep {i} {uuid.uuid4().hex[:6]}', 'search_type': 'deep'})
+        status_url = response.get_json()['status_url']
+        while True:
+            status = client.get(status_url).get_json()
+            if status['status'] in ('done', 'error'):
+                break
+            time.sleep(0.02)
+        routes['search_deep_job'].append(time.perf_counter() - started)
+
+        if status['status'] == 'done':
+            started = time.perf_counter()
+            client.post('/ask', data={'search_id': status['result'], 'question': f'deep follow-up {i}', 'search_type': 'deep'})
+            routes['ask_deep'].append(time.perf_counter() - started)
+    result['routes'] = {name: summarize(values) for name, values in routes.items()}
+
+    result['server'] = {'requests': web.requests, 'bytes_sent': web.bytes_sent}
+    result['gemini_calls'] = gemini.calls
+    # ru_maxrss у Linux в КБ
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    web.stop()
+    return result
+
+if __name__ == '__main__':
+    main()
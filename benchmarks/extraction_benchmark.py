@@ -0,0 +1,143 @@
+"""
+Бенчмарк витягування тексту з HTML.
+
+Порівнює попередній екстрактор (BeautifulSoup + html.parser) з однопрохідним
+extractor.py на кожному доступному парсері. Для кожного варіанту виводить
+швидкість (сторінок/с), пік пам'яті та збіг результату з попереднім екстрактором.
+
+Запуск з кореня проєкту:
+    python benchmarks/extraction_benchmark.py
+    python benchmarks/extraction_benchmark.py --corpus path/to/saved/pages --repeat 50 --json
+
+Кожен варіант виконується в окремому процесі, тож max RSS не змішується між ними.
+tracemalloc бачить лише пам'ять Python; пам'ять libxml2 (lxml) видно тільки в max RSS.
+"""
+import argparse
+import difflib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+from extractor import extract_text, available_parsers
+from utils import extract_text_from_soup
+
+DEFAULT_CORPUS = os.path.join(ROOT, 'benchmarks', 'corpus')
+
+def legacy_extract(html):
+    return extract_text_from_soup(BeautifulSoup(html, 'html.parser'))
+
+def get_extractors():
+    extractors = {'legacy-bs4': legacy_extract}
+    for parser in available_parsers():
+        extractors[f'extractor-{parser}'] = lambda html, parser=parser: extract_text(html, parser=parser)
+    return extractors
+
+def load_corpus(path):
+    pages = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(path, name), 'rb') as f:
+                pages[name] = f.read()
+    return pages
+
+def _words(text):
+    return text.split()
+
+def parity(reference, text):
+    """Схожість за словами (0..1) і чи збігається текст з точністю до пробілів."""
+    reference_words, words = _words(reference), _words(text)
+    ratio = difflib.SequenceMatcher(None, reference_words, words, autojunk=False).ratio() \
+        if reference_words or words else 1.0
+    return ratio, reference_words == words
+
+def run_one(name, corpus, repeat):
+    """Вимірює один екстрактор у поточному процесі."""
+    extract = get_extractors()[name]
+    outputs = {page: extract(html) for page, html in corpus.items()}  # прогрів і результати для збігу
+
+    tracemalloc.start()
+    for html in corpus.values():
+        extract(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_bytes = sum(len(html) for html in corpus.values()) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in corpus.values():
+            extract(html)
+    elapsed = time.perf_counter() - started
+
+    pages = len(corpus) * repeat
+    return {
+        'extractor': name,
+        'pages': pages,
+        'seconds': round(elapsed, 4),
+        'pages_per_sec': round(pages / elapsed, 1) if elapsed else None,
+        'mb_per_sec': round(total_bytes / elapsed / 1024 / 1024, 2) if elapsed else None,
+        'tracemalloc_peak_kb': round(peak / 1024, 1),
+        # ru_maxrss у Linux в КБ
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'outputs': outputs,
+    }
+
+def run_isolated(name, corpus_path, repeat):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--corpus', corpus_path,
+         '--repeat', str(repeat), '--only', name],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='каталог з збереженими .html сторінками')
+    parser.add_argument('--repeat', type=int, default=20, help='скільки разів пройти корпус')
+    parser.add_argument('--json', action='store_true', help='вивести результат як JSON')
+    parser.add_argument('--only', help=argparse.SUPPRESS)  # внутрішній режим одного процесу
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"У {args.corpus} немає .html файлів")
+
+    if args.only:
+        print(json.dumps(run_one(args.only, corpus, args.repeat), ensure_ascii=False))
+        return
+
+    results = [run_isolated(name, args.corpus, args.repeat) for name in get_extractors()]
+    reference = results[0]['outputs']
+    for result in results:
+        ratios = []
+        exact = 0
+        for page, text in result.pop('outputs').items():
+            ratio, same = parity(reference[page], text)
+            ratios.append(ratio)
+            exact += same
+        result['parity_mean'] = round(sum(ratios) / len(ratios), 4)
+        result['parity_min'] = round(min(ratios), 4)
+        result['parity_exact'] = f"{exact}/{len(ratios)}"
+
+    if args.json:
+        print(json.dumps({'corpus_pages': len(corpus), 'repeat': args.repeat, 'results': results},
+                         ensure_ascii=False, indent=2))
+        return
+
+    print(f"Корпус: {len(corpus)} сторінок, {sum(map(len, corpus.values())) // 1024} КБ, повторів: {args.repeat}")
+    header = f"{'екстрактор':<24}{'стор/с':>10}{'МБ/с':>8}{'peak py КБ':>12}{'max RSS КБ':>12}{'збіг сер.':>11}{'мін.':>8}{'точно':>8}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['extractor']:<24}{r['pages_per_sec']:>10}{r['mb_per_sec']:>8}{r['tracemalloc_peak_kb']:>12}"
+              f"{r['max_rss_kb']:>12}{r['parity_mean']:>11}{r['parity_min']:>8}{r['parity_exact']:>8}")
+
+if __name__ == '__main__':
+    main()
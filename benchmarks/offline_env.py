@@ -0,0 +1,188 @@
+"""
+Локальні замінники зовнішніх сервісів для офлайн-бенчмарків:
+
+- OfflineWeb: HTTP сервер з видачею у форматі html.duckduckgo.com і сторінками статей
+  з налаштовуваною затримкою, розміром і часткою помилок;
+- FakeGeminiClient: детермінований клієнт Gemini з налаштовуваною затримкою.
+
+Підключення до застосунку - через звичайні точки розширення:
+set_search_backends([DuckDuckGoHTMLBackend(web.serp_url)]) і set_gemini_client(FakeGeminiClient(...)).
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+VOCABULARY = ("мережа дані сервер запит відповідь кеш індекс сторінка браузер пошук алгоритм швидкість "
+              "пам'ять потік процес база таблиця транзакція протокол клієнт модель текст network latency "
+              "cache index parser thread queue budget report source article research result").split()
+
+def _seed(*parts):
+    return int(hashlib.sha256('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()[:16], 16)
+
+def _sentence(rng):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 16))]
+    return words[0].capitalize() + ' ' + ' '.join(words[1:]) + '.'
+
+def render_article(article_id, size_bytes):
+    """Детермінована сторінка статті з типовим оточенням (меню, скрипти, футер) приблизно size_bytes."""
+    rng = random.Random(_seed('article', article_id))
+    head = (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Стаття {article_id}</title>"
+            f"<link rel=\"icon\" href=\"/favicon.ico\"><script>var analytics = {{id: '{article_id}'}};</script>"
+            f"<style>body {{ font-family: sans-serif }}</style></head><body>"
+            f"<header><nav>" + ''.join(f"<a href=\"/section/{i}\">Розділ {i}</a>" for i in range(12)) +
+            f"</nav></header><main><article class=\"post-content\"><h1>Стаття {article_id}</h1>")
+    tail = "</article></main><footer>© Offline bench</footer><script src=\"/app.js\"></script></body></html>"
+    parts = [head]
+    size = len(head) + len(tail)
+    while size < size_bytes:
+        paragraph = '<p>' + ' '.join(_sentence(rng) for _ in range(rng.randint(3, 6))) + '</p>'
+        parts.append(paragraph)
+        size += len(paragraph.encode('utf-8'))
+    parts.append(tail)
+    return ''.join(parts).encode('utf-8')
+
+class OfflineWeb:
+    """
+    Локальний "інтернет": /html/?q=... - видача DuckDuckGo, /article/<id> - статті,
+    /favicon.ico - іконка. Для кожного запиту видача детермінована; results_overlap
+    посилань спільні для всіх запитів, щоб перевіряти дедуплікацію URL.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, page_bytes=20000, results_per_serp=10,
+                 results_overlap=1, error_rate=0.0, serp_latency=0.1):
+        self.latency = latency
+        self.jitter = jitter
+        self.page_bytes = page_bytes
+        self.results_per_serp = results_per_serp
+        self.results_overlap = results_overlap
+        self.error_rate = error_rate
+        self.serp_latency = serp_latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def serp_url(self):
+        return f"{self.base_url}/html/"
+
+    def start(self):
+        web = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_GET(self, head=False):
+                status, content_type, body = web.route(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head:
+                    try:
+                        self.wfile.write(body)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                with web._lock:
+                    web.requests += 1
+                    web.bytes_sent += 0 if head else len(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name='offline-web')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _sleep(self, base, key):
+        if base:
+            rng = random.Random(_seed('latency', key))
+            time.sleep(max(0.0, base + rng.uniform(-self.jitter, self.jitter)))
+
+    def route(self, path):
+        parts = urlsplit(path)
+        if parts.path == '/html/':
+            query = parse_qs(parts.query).get('q', [''])[0]
+            self._sleep(self.serp_latency, query)
+            return 200, 'text/html; charset=utf-8', self.render_serp(query)
+        if parts.path.startswith('/article/'):
+            article_id = parts.path[len('/article/'):]
+            self._sleep(self.latency, article_id)
+            if random.Random(_seed('error', article_id)).random() < self.error_rate:
+                return 404, 'text/html; charset=utf-8', b'<html><body>Not found</body></html>'
+            return 200, 'text/html; charset=utf-8', render_article(article_id, self.page_bytes)
+        if parts.path == '/favicon.ico':
+            return 200, 'image/x-icon', b'\x00\x00\x01\x00'
+        return 404, 'text/plain', b'not found'
+
+    def render_serp(self, query):
+        query_id = hashlib.sha256(query.encode('utf-8')).hexdigest()[:10]
+        article_ids = [f"shared-{i}" for i in range(self.results_overlap)]
+        article_ids += [f"{query_id}-{i}" for i in range(self.results_per_serp - len(article_ids))]
+        results = []
+        for article_id in article_ids:
+            target = quote(f"{self.base_url}/article/{article_id}", safe='')
+            results.append(
+                f'<div class="result results_links web-result"><div class="links_main">'
+                f'<h2 class="result__title"><a class="result__a" href="//duckduckgo.com/l/?uddg={target}">'
+                f'Стаття {article_id}</a></h2>'
+                f'<a class="result__snippet">Опис статті {article_id} для запиту {query}</a></div></div>'
+            )
+        return ('<html><body><div id="links" class="results">' + ''.join(results) +
+                '</div></body></html>').encode('utf-8')
+
+class FakeGeminiClient:
+    """
+    Детермінований замінник GeminiClient: відповідь залежить лише від промпту.
+    На запит підзапитів повертає рядки підзапитів, на решту - Markdown звіт.
+    """
+
+    def __init__(self, api_key='offline-key', latency=0.3, report_chars=1500, stream_chunks=10):
+        self.api_key = api_key
+        self.latency = latency
+        self.report_chars = report_chars
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+        rng = random.Random(_seed('gemini', prompt))
+        if 'ОРИГІНАЛЬНИЙ ЗАПИТ' in prompt:
+            topic = prompt.split('ОРИГІНАЛЬНИЙ ЗАПИТ: "', 1)[-1].split('"', 1)[0]
+            return '\n'.join(f"{topic} {rng.choice(VOCABULARY)} {i}" for i in range(5))
+        lines = ['## Основне', _sentence(rng), '', '## Ключові пункти']
+        while sum(map(len, lines)) < self.report_chars:
+            lines.append(f"- {_sentence(rng)}")
+        return '\n'.join(lines)
+
+    def generate(self, prompt):
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    def generate_stream(self, prompt):
+        text = self._answer(prompt)
+        step = max(1, len(text) // self.stream_chunks)
+        for start in range(0, len(text), step):
+            time.sleep(self.latency / self.stream_chunks)
+            yield text[start:start + step]
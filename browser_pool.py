@@ -0,0 +1,340 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, JavascriptException, SessionNotCreatedException
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Налаштування пулу можна змінити через змінні середовища
+POOL_SIZE = int(os.environ.get('DEEPSCOUT_BROWSER_POOL_SIZE', 2))
+MAX_PAGES_PER_DRIVER = int(os.environ.get('DEEPSCOUT_BROWSER_MAX_PAGES', 50))
+CHECKOUT_TIMEOUT = float(os.environ.get('DEEPSCOUT_BROWSER_CHECKOUT_TIMEOUT', 60))
+
+# Шлях до вже встановленого chromedriver (перекриває автоматичне визначення)
+CHROMEDRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH')
+DRIVER_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'chromedriver.json')
+
+# Очікування готовності сторінки: жорсткий ліміт і "тиша" в мережі, після якої сторінку вважаємо завантаженою
+PAGE_READY_TIMEOUT = float(os.environ.get('DEEPSCOUT_PAGE_READY_TIMEOUT', 10))
+NETWORK_QUIET_SECONDS = float(os.environ.get('DEEPSCOUT_NETWORK_QUIET', 0.5))
+# Типовий буфер Resource Timing - 250 записів; коли він заповнений, нові запити в ньому
+# не з'являються і мережа виглядала б "тихою", тому на кожній сторінці його збільшуємо
+RESOURCE_TIMING_BUFFER_SIZE = int(os.environ.get('DEEPSCOUT_RESOURCE_TIMING_BUFFER', 10000))
+# Не завантажувати зображення, шрифти і медіа - тексту вони не додають
+BLOCK_HEAVY_RESOURCES = os.environ.get('DEEPSCOUT_BROWSER_BLOCK_RESOURCES', '1') == '1'
+BLOCKED_URL_PATTERNS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+                        '*.mp4', '*.webm', '*.ogg', '*.mp3', '*.wav', '*.m4a', '*.avi', '*.mov']
+# Селектори основного вмісту: щойно один з них є на сторінці, можна не чекати повного load
+CONTENT_SELECTORS = ('main', 'article', '[role="main"]', '#content', '.content', '.post-content',
+                     '.entry-content', '.article-content')
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36"
+
+def build_chrome_options():
+    """Спільні опції headless Chrome для пошуку і парсингу сторінок."""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    # driver.get повертається після DOMContentLoaded; далі чекаємо самі (wait_for_page_ready)
+    chrome_options.page_load_strategy = 'eager'
+    if BLOCK_HEAVY_RESOURCES:
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--mute-audio')
+        chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+        })
+    return chrome_options
+
+_driver_path = None
+_driver_path_resolved = False
+_driver_path_lock = threading.Lock()
+
+def _load_cached_driver_path():
+    try:
+        with open(DRIVER_CACHE_FILE, 'r') as f:
+            path = json.load(f).get('path')
+        if path and os.path.isfile(path):
+            return path
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _save_cached_driver_path(path):
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, 'w') as f:
+            json.dump({'path': path}, f)
+    except OSError as e:
+        logging.warning(f"Не вдалося зберегти шлях до chromedriver: {e}")
+
+def resolve_chromedriver():
+    """
+    Визначає шлях до chromedriver один раз за життя процесу.
+    Порядок: змінна CHROMEDRIVER_PATH, збережений на диску шлях, ChromeDriverManager.
+    Якщо нічого не вдалося (наприклад, немає мережі), повертає None -
+    тоді Selenium сам шукає драйвер через Selenium Manager / PATH.
+    """
+    global _driver_path, _driver_path_resolved
+    with _driver_path_lock:
+        if _driver_path_resolved:
+            return _driver_path
+
+        path = None
+        if CHROMEDRIVER_PATH:
+            if os.path.isfile(CHROMEDRIVER_PATH):
+                path = CHROMEDRIVER_PATH
+            else:
+                logging.warning(f"CHROMEDRIVER_PATH вказує на неіснуючий файл: {CHROMEDRIVER_PATH}")
+
+        if path is None:
+            path = _load_cached_driver_path()
+
+        if path is None:
+            try:
+                path = ChromeDriverManager().install()
+                _save_cached_driver_path(path)
+            except Exception as e:
+                logging.warning(f"Не вдалося встановити chromedriver через ChromeDriverManager: {e}")
+
+        _driver_path = path
+        _driver_path_resolved = True
+        logging.info(f"Використовується chromedriver: {path or 'Selenium Manager / PATH'}")
+        return path
+
+def invalidate_chromedriver():
+    """Забуває визначений і збережений на диску шлях; наступний resolve_chromedriver шукає драйвер знову."""
+    global _driver_path, _driver_path_resolved
+    with _driver_path_lock:
+        _driver_path = None
+        _driver_path_resolved = False
+        try:
+            os.remove(DRIVER_CACHE_FILE)
+        except OSError:
+            pass
+
+def create_driver():
+    path = resolve_chromedriver()
+    try:
+        driver = webdriver.Chrome(service=Service(path) if path else Service(), options=build_chrome_options())
+    except SessionNotCreatedException as e:
+        # Після автооновлення Chrome збережений chromedriver уже не підходить до браузера:
+        # визначаємо драйвер заново і пробуємо ще раз. Шлях із CHROMEDRIVER_PATH не чіпаємо
+        if not path or path == CHROMEDRIVER_PATH:
+            raise
+        logging.warning(f"chromedriver {path} не підходить до встановленого Chrome, шукаємо новий: {e}")
+        invalidate_chromedriver()
+        path = resolve_chromedriver()
+        driver = webdriver.Chrome(service=Service(path) if path else Service(), options=build_chrome_options())
+    driver.set_page_load_timeout(PAGE_READY_TIMEOUT * 3)
+    if BLOCK_HEAVY_RESOURCES:
+        # Шрифти і медіа через prefs не вимкнути, тому блокуємо їх на рівні мережі (CDP)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logging.warning(f"Не вдалося заблокувати шрифти і медіа через CDP: {e}")
+    return driver
+
+# Один виклик JS повертає все, що потрібно для перевірки готовності
+_READY_STATE_SCRIPT = """
+if (!window.__deepscoutTimingBuffer && performance.setResourceTimingBufferSize) {
+    performance.setResourceTimingBufferSize(arguments[1]);
+    window.__deepscoutTimingBuffer = true;
+}
+return [document.readyState,
+        arguments[0].some(function (selector) { return document.querySelector(selector) !== null; }),
+        performance.getEntriesByType('resource').length];
+"""
+
+class _PageReady:
+    """
+    Умова для WebDriverWait: DOM розібрано (readyState interactive/complete), є основний
+    вміст (один із selectors) або сторінка повністю завантажена, і вже quiet секунд
+    не стартує жодного нового мережевого запиту.
+    """
+
+    def __init__(self, selectors, quiet):
+        self.selectors = list(selectors)
+        self.quiet = quiet
+        self.resources = None
+        self.quiet_since = None
+
+    def __call__(self, driver):
+        state, has_content, resources = driver.execute_script(_READY_STATE_SCRIPT, self.selectors,
+                                                              RESOURCE_TIMING_BUFFER_SIZE)
+        now = time.monotonic()
+        if resources != self.resources:
+            self.resources = resources
+            self.quiet_since = now
+        if state == 'loading' or (state != 'complete' and not has_content):
+            return False
+        return now - self.quiet_since >= self.quiet
+
+def open_page(driver, url):
+    """driver.get, який при перевищенні page load timeout зупиняє завантаження замість помилки."""
+    try:
+        driver.get(url)
+    except TimeoutException:
+        logging.info(f"Сторінка {url} завантажується задовго, зупиняємо завантаження")
+        driver.execute_script("window.stop();")
+
+def wait_for_page_ready(driver, selectors=CONTENT_SELECTORS, timeout=PAGE_READY_TIMEOUT, quiet=NETWORK_QUIET_SECONDS):
+    """
+    Явне очікування готовності сторінки замість фіксованих пауз.
+    Повертає True, якщо сторінка готова, або False, якщо спрацював жорсткий ліміт timeout
+    (тоді працюємо з тим, що встигло завантажитись). Помилки JS під час перевірки
+    (наприклад, сторінка саме переходить за редиректом) не переривають очікування.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1,
+                      ignored_exceptions=(JavascriptException,)).until(_PageReady(selectors, quiet))
+        return True
+    except TimeoutException:
+        logging.info(f"Сторінка не стала готовою за {timeout} с, беремо наявний вміст")
+        return False
+
+class PooledDriver:
+    """WebDriver разом з лічильником відкритих сторінок."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+    def is_healthy(self):
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.warning(f"Не вдалося коректно закрити браузер: {e}")
+
+class BrowserPool:
+    """
+    Пул "теплих" headless браузерів з семантикою checkout/checkin.
+    Браузери створюються ліниво (не більше size), перевіряються перед видачею
+    і перезапускаються після max_pages сторінок, щоб не накопичувати пам'ять.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES_PER_DRIVER, driver_factory=create_driver):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.driver_factory = driver_factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        """Видає здоровий браузер з пулу, за потреби створюючи новий."""
+        if self._closed:
+            raise RuntimeError("Пул браузерів закрито")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                pooled = None
+
+            if pooled is None:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return PooledDriver(self.driver_factory())
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+
+                # Чекаємо короткими інтервалами: місце може звільнитися і через закриття браузера
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Немає вільного браузера в пулі")
+                try:
+                    pooled = self._idle.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+
+            if pooled.is_healthy():
+                return pooled
+
+            logging.info("Браузер з пулу не відповідає, перезапускаємо")
+            self._discard(pooled)
+
+    def checkin(self, pooled, broken=False):
+        """Повертає браузер у пул або закриває його, якщо він зламаний чи відпрацював ліміт."""
+        pooled.pages += 1
+        if broken or self._closed or pooled.pages >= self.max_pages:
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self):
+        """Контекстний менеджер: `with pool.driver() as driver: ...`"""
+        pooled = self.checkout()
+        broken = False
+        try:
+            yield pooled.driver
+        except Exception:
+            broken = not pooled.is_healthy()
+            raise
+        finally:
+            self.checkin(pooled, broken=broken)
+
+    def _discard(self, pooled):
+        pooled.quit()
+        with self._lock:
+            self._created -= 1
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Повертає спільний для процесу пул браузерів."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+def shutdown_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+atexit.register(shutdown_browser_pool)
@@ -0,0 +1,118 @@
+import math
+import os
+import re
+from collections import Counter
+
+# Бюджет контексту для звіту і обмеження на одне джерело (у символах)
+CONTEXT_BUDGET_CHARS = int(os.environ.get('DEEPSCOUT_CONTEXT_CHARS', 30000))
+PER_SOURCE_CHARS = int(os.environ.get('DEEPSCOUT_CONTEXT_PER_SOURCE_CHARS', 8000))
+CHUNK_CHARS = int(os.environ.get('DEEPSCOUT_CONTEXT_CHUNK_CHARS', 1000))
+# Вага підзапитів відносно основного запиту при ранжуванні
+SUB_QUERY_WEIGHT = 0.5
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS):
+    """Ділить текст на шматки до chunk_chars символів по межах абзаців/рядків."""
+    chunks = []
+    current = []
+    current_len = 0
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # Надто довгі абзаци ріжемо напряму
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append('\n'.join(current))
+                current, current_len = [], 0
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current_len + len(paragraph) > chunk_chars and current:
+            chunks.append('\n'.join(current))
+            current, current_len = [], 0
+        current.append(paragraph)
+        current_len += len(paragraph) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+class BM25:
+    """Мінімальна реалізація Okapi BM25 над списком токенізованих документів."""
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / len(documents)) if documents else 0
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        total = len(documents)
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def score(self, query_tokens, index):
+        freqs = self.term_freqs[index]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.avg_length or 1))
+        score = 0.0
+        for term in set(query_tokens):
+            tf = freqs.get(term)
+            if tf:
+                score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return score
+
+def build_context(query, sub_queries, sources, budget=CONTEXT_BUDGET_CHARS,
+                  per_source=PER_SOURCE_CHARS, chunk_chars=CHUNK_CHARS):
+    """
+    Збирає контекст для звіту: ріже кожне джерело на шматки, ранжує їх BM25 відносно
+    запиту та підзапитів і жадібно пакує найкращі в бюджет з обмеженням на джерело.
+    sources - список {'title', 'content'}; шматки виводяться згруповано за джерелами
+    в початковому порядку, щоб текст залишався зв'язним.
+    """
+    chunks = []  # (індекс джерела, порядковий номер шматка, текст)
+    for source_index, source in enumerate(sources):
+        for position, chunk in enumerate(chunk_text(source.get('content') or '', chunk_chars)):
+            chunks.append((source_index, position, chunk))
+    if not chunks:
+        return ""
+
+    bm25 = BM25([tokenize(chunk) for _, _, chunk in chunks])
+    query_tokens = tokenize(query)
+    sub_query_tokens = tokenize(' '.join(sub_queries or []))
+    scores = [bm25.score(query_tokens, i) + SUB_QUERY_WEIGHT * bm25.score(sub_query_tokens, i)
+              for i in range(len(chunks))]
+
+    # Найкращі шматки першими; при рівних балах - ранні джерела і ранні шматки
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], chunks[i][0], chunks[i][1]))
+
+    used_total = 0
+    used_per_source = Counter()
+    selected = []
+    for i in ranked:
+        source_index, _, chunk = chunks[i]
+        header_len = len(sources[source_index].get('title') or '') + 6 if not used_per_source[source_index] else 0
+        cost = len(chunk) + 2 + header_len
+        if used_per_source[source_index] + cost > per_source:
+            continue
+        if used_total + cost > budget:
+            continue
+        selected.append(i)
+        used_total += cost
+        used_per_source[source_index] += cost
+
+    parts = []
+    current_source = None
+    for i in sorted(selected, key=lambda i: (chunks[i][0], chunks[i][1])):
+        source_index, _, chunk = chunks[i]
+        if source_index != current_source:
+            parts.append(f"# {sources[source_index].get('title') or ''}")
+            current_source = source_index
+        parts.append(chunk)
+    return '\n\n'.join(parts)
@@ -0,0 +1,98 @@
+import os
+from datetime import datetime
+from database import Message, ConversationSummary
+from search import get_gemini_response
+from rendering import render_markdown
+
+# Скільки останніх пар запитання/відповідь передавати в промпт дослівно
+CONTEXT_TURNS = int(os.environ.get('DEEPSCOUT_CONTEXT_TURNS', 3))
+
+def append_message(session, search_id, role, content):
+    """Додає повідомлення до розмови; відповіді одразу рендеряться в HTML. Коміт робить викликач."""
+    message = Message(search_id=search_id, role=role, content=content, created_at=datetime.utcnow(),
+                      content_html=render_markdown(content) if role == 'assistant' else None)
+    session.add(message)
+    return message
+
+def load_messages(session, search_entry):
+    """Повідомлення розмови у вигляді [{'id', 'role', 'content', 'html'}]; html може бути None для старих записів."""
+    rows = session.query(Message.id, Message.role, Message.content, Message.content_html) \
+                  .filter(Message.search_id == search_entry.id) \
+                  .order_by(Message.id).all()
+    return [{'id': row.id, 'role': row.role, 'content': row.content, 'html': row.content_html} for row in rows]
+
+def completed_turns(messages):
+    """
+    Лише завершені пари: запитання, за яким одразу йде відповідь. Запитання без відповіді
+    (потік так і не підключився або Gemini повернув помилку) пропускаються, щоб наступні
+    пари не зсунулись.
+    """
+    completed = []
+    for message, following in zip(messages, messages[1:]):
+        if message['role'] == 'user' and following['role'] == 'assistant':
+            completed.extend((message, following))
+    return completed
+
+def format_turns(messages):
+    """Пари запитання/відповідь у вигляді тексту для промпту."""
+    messages = completed_turns(messages)
+    conversation_context = ""
+    for i in range(0, len(messages), 2):
+        user_q = messages[i]['content']
+        ai_a = messages[i+1]['content']
+        conversation_context += f"Запитання: {user_q}\nВідповідь: {ai_a}\n\n"
+    return conversation_context
+
+def _summarize(previous_summary, messages, api_key):
+    prompt = f"""Стисло підсумуй розмову для подальшого контексту (до 8 речень).
+Збережи ключові факти, терміни, висновки та уподобання користувача. Мова - мова розмови.
+
+ПОПЕРЕДНІЙ ПІДСУМОК:
+{previous_summary or "немає"}
+
+НОВІ РЕПЛІКИ:
+{format_turns(messages)}"""
+    return get_gemini_response(prompt, api_key)
+
+def build_conversation_context(session, search_id, messages, api_key):
+    """
+    Контекст розмови обмеженого розміру: свіжі репліки дослівно, а все старіше - у вигляді
+    підсумку. Підсумок зберігається в БД і оновлюється пакетами: лише коли поза останніми
+    CONTEXT_TURNS парами накопичилось ще CONTEXT_TURNS непідсумованих пар. Тож дослівно
+    йде від CONTEXT_TURNS до 2 * CONTEXT_TURNS пар, а додатковий виклик Gemini перед
+    відповіддю буває раз на CONTEXT_TURNS запитань, а не на кожному.
+    messages - розмова без питання, на яке зараз генерується відповідь; у контекст
+    і в лічильник підсумку (summarized_count) йдуть лише завершені пари.
+    """
+    messages = completed_turns(messages)
+    keep = CONTEXT_TURNS * 2
+    # Рахуємо межу по парах, щоб не розірвати запитання і відповідь
+    cutoff = max(0, (len(messages) - keep) // 2 * 2)
+    if cutoff == 0 or not api_key:
+        return format_turns(messages[cutoff:])
+
+    summary_row = session.query(ConversationSummary).get(search_id)
+    summary = summary_row.summary if summary_row else ""
+    # Підсумок не може покривати більше, ніж дозволяє межа (історія могла скоротитись)
+    summarized = min(summary_row.summarized_count if summary_row else 0, cutoff)
+
+    if cutoff - summarized >= keep:
+        new_summary = _summarize(summary, messages[summarized:cutoff], api_key)
+        if new_summary and not new_summary.startswith("Помилка"):
+            summary = new_summary
+            summarized = cutoff
+            if summary_row is None:
+                summary_row = ConversationSummary(search_id=search_id)
+                session.add(summary_row)
+            summary_row.summary = summary
+            summary_row.summarized_count = cutoff
+            summary_row.updated_at = datetime.utcnow()
+            session.commit()
+        else:
+            # Без підсумку краще передати старі репліки як є, ніж загубити їх
+            return format_turns(messages)
+
+    recent = format_turns(messages[summarized:])
+    if not summary:
+        return recent
+    return f"Підсумок попередньої розмови:\n{summary}\n\n{recent}"
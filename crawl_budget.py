@@ -0,0 +1,107 @@
+import json
+import os
+import time
+from context_builder import CONTEXT_BUDGET_CHARS, PER_SOURCE_CHARS
+from dedup import similarity, DEDUP_SIMILARITY
+
+# Бюджетний режим глибокого пошуку: завантаження сторінок зупиняється, щойно зібрано
+# достатньо корисного тексту або вичерпано час, і звіт генерується одразу
+CRAWL_BUDGET_ENABLED = os.environ.get('DEEPSCOUT_CRAWL_BUDGET', '1') == '1'
+# Загальний час на пошук від старту (підзапити, видача, сторінки), секунди
+CRAWL_TIME_BUDGET = float(os.environ.get('DEEPSCOUT_CRAWL_TIME_BUDGET', 45))
+# Скільки корисного тексту достатньо: із запасом понад бюджет контексту звіту,
+# щоб ранжуванню (context_builder) було з чого вибирати
+CRAWL_TARGET_CHARS = int(os.environ.get('DEEPSCOUT_CRAWL_TARGET_CHARS', 2 * CONTEXT_BUDGET_CHARS))
+# Раніше за MIN_SOURCES джерел за обсягом тексту не зупиняємось; MAX_SOURCES - досить завжди
+CRAWL_MIN_SOURCES = int(os.environ.get('DEEPSCOUT_CRAWL_MIN_SOURCES', 3))
+CRAWL_MAX_SOURCES = int(os.environ.get('DEEPSCOUT_CRAWL_MAX_SOURCES', 10))
+
+# Сторінки з цих джерел не містять тексту самої сторінки
+USELESS_SOURCES = ('fallback', 'skipped', 'cancelled')
+
+class CrawlBudget:
+    """
+    Облік корисного вмісту під час глибокого пошуку. Корисне джерело - сторінка з
+    реальним текстом, яка не є майже дублікатом уже врахованої; у обсяг тексту кожне
+    джерело йде не більше ніж PER_SOURCE_CHARS, бо більше у звіт від нього не потрапить.
+    Ліміти None означають "без обмеження" (режим вимкнено).
+    """
+
+    def __init__(self, time_budget=CRAWL_TIME_BUDGET, target_chars=CRAWL_TARGET_CHARS,
+                 min_sources=CRAWL_MIN_SOURCES, max_sources=CRAWL_MAX_SOURCES):
+        self.time_budget = time_budget
+        self.target_chars = target_chars
+        self.min_sources = min_sources
+        self.max_sources = max_sources
+        self.started = time.monotonic()
+        self.pages = 0
+        self.sources = 0
+        self.useful_chars = 0
+        self.stop_reason = None
+        self.abandoned = 0
+        self.elapsed = None
+        self._fingerprints = []
+
+    @classmethod
+    def from_settings(cls):
+        if CRAWL_BUDGET_ENABLED:
+            return cls()
+        return cls(time_budget=None, target_chars=None, min_sources=0, max_sources=None)
+
+    def remaining(self, default):
+        """Скільки секунд лишилось, але не більше default (власного ліміту етапу)."""
+        if self.time_budget is None:
+            return default
+        return max(0.0, min(default, self.started + self.time_budget - time.monotonic()))
+
+    def add(self, page):
+        """Враховує завантажену сторінку; повертає True, якщо вона корисна."""
+        self.pages += 1
+        if not page or page.get('source') in USELESS_SOURCES:
+            return False
+        fingerprint = page.get('fingerprint')
+        if fingerprint is not None:
+            if any(similarity(fingerprint, other) >= DEDUP_SIMILARITY for other in self._fingerprints):
+                return False
+            self._fingerprints.append(fingerprint)
+        self.sources += 1
+        self.useful_chars += min(len(page.get('content') or ''), PER_SOURCE_CHARS)
+        return True
+
+    def is_met(self):
+        """Чи зібрано достатньо, щоб припинити завантаження і генерувати звіт."""
+        if self.max_sources is not None and self.sources >= self.max_sources:
+            return True
+        return self.target_chars is not None and self.sources >= self.min_sources \
+            and self.useful_chars >= self.target_chars
+
+    def finish(self, abandoned=0):
+        """Фіксує підсумок: причину зупинки і скільки сторінок не дочекались."""
+        self.abandoned = abandoned
+        self.elapsed = time.monotonic() - self.started
+        if self.max_sources is not None and self.sources >= self.max_sources:
+            self.stop_reason = 'max_sources'
+        elif self.is_met():
+            self.stop_reason = 'target_chars'
+        elif abandoned:
+            self.stop_reason = 'time_budget'
+        else:
+            self.stop_reason = 'all_fetched'
+
+    def to_dict(self):
+        return {
+            'enabled': self.time_budget is not None,
+            'time_budget': self.time_budget,
+            'elapsed': round(self.elapsed, 3) if self.elapsed is not None else None,
+            'target_chars': self.target_chars,
+            'useful_chars': self.useful_chars,
+            'min_sources': self.min_sources,
+            'max_sources': self.max_sources,
+            'sources': self.sources,
+            'pages': self.pages,
+            'abandoned': self.abandoned,
+            'stop_reason': self.stop_reason,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
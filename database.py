@@ -1,9 +1,35 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey
+import json
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from rendering import render_markdown
 
-engine = create_engine('sqlite:///deepscout.db', echo=False)
+DATABASE_URL = os.environ.get('DEEPSCOUT_DATABASE_URL', 'sqlite:///deepscout.db')
+# Скільки мс чекати на блокування БД іншим потоком замість помилки "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get('DEEPSCOUT_DB_BUSY_TIMEOUT_MS', 5000))
+
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == 'sqlite'
+
+# check_same_thread=False: з'єднання з пулу можуть використовуватись різними потоками запитів.
+# Цей параметр і PRAGMA нижче є лише в SQLite; інші СУБД отримують налаштування за замовчуванням
+engine = create_engine(DATABASE_URL, echo=False,
+                       connect_args={'check_same_thread': False} if IS_SQLITE else {})
 Base = declarative_base()
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL дозволяє читати під час запису; synchronous=NORMAL достатньо надійний для WAL."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+if IS_SQLITE:
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+
 class Search(Base):
     __tablename__ = 'searches'
 
@@ -11,9 +37,18 @@ class Search(Base):
     query = Column(Text)
     search_type = Column(Text)
     response = Column(Text)
-    chat_history = Column(Text)  # JSON string storing conversation history
+    response_html = Column(Text)  # відрендерений Markdown відповіді
+    chat_history = Column(Text)  # Застаріле: JSON історії чату, тепер повідомлення в таблиці messages
+    timings = Column(Text)  # JSON розбивки часу глибокого пошуку по етапах (metrics.SearchTrace)
+    crawl_budget = Column(Text)  # JSON використання бюджету завантаження (crawl_budget.CrawlBudget)
 
     webpages = relationship("WebPage", back_populates="search")
+    messages = relationship("Message", back_populates="search", order_by="Message.id")
+
+    def set_response(self, response):
+        """Зберігає відповідь разом з готовим HTML, щоб не рендерити Markdown при кожному показі."""
+        self.response = response
+        self.response_html = render_markdown(response)
 
     def __repr__(self):
         return f"<Search(query='{self.query}', type='{self.search_type}')>"
@@ -22,23 +57,219 @@ class WebPage(Base):
     __tablename__ = 'webpages'
 
     id = Column(Integer, primary_key=True)
-    search_id = Column(Integer, ForeignKey('searches.id'))
+    search_id = Column(Integer, ForeignKey('searches.id'), index=True)
     url = Column(Text)
     title = Column(Text)
     icon_url = Column(Text)
     content = Column(Text)
+    # SimHash вмісту. Майже однакові сторінки відкидаються в межах одного пошуку (dedup.py);
+    # між пошуками відбиток поки не використовується, тому й індексу за ним немає
+    fingerprint = Column(Integer)
 
     search = relationship("Search", back_populates="webpages")
 
     def __repr__(self):
         return f"<WebPage(url='{self.url}', title='{self.title}')>"
 
+class Message(Base):
+    """Одне повідомлення розмови; таблиця лише доповнюється (append-only)."""
+    __tablename__ = 'messages'
+
+    id = Column(Integer, primary_key=True)
+    search_id = Column(Integer, ForeignKey('searches.id'), index=True, nullable=False)
+    role = Column(String(16), nullable=False)  # user | assistant
+    content = Column(Text)
+    content_html = Column(Text)  # відрендерений Markdown для відповідей assistant
+    created_at = Column(DateTime)
+
+    search = relationship("Search", back_populates="messages")
+
+    def __repr__(self):
+        return f"<Message(search_id={self.search_id}, role='{self.role}')>"
+
+class ConversationSummary(Base):
+    """Стислий підсумок старих реплік розмови, що не потрапляють у вікно контексту."""
+    __tablename__ = 'conversation_summaries'
+
+    search_id = Column(Integer, ForeignKey('searches.id'), primary_key=True)
+    summary = Column(Text)
+    summarized_count = Column(Integer, default=0)  # скільки перших повідомлень покриває підсумок
+    updated_at = Column(DateTime)
+
+class PageCache(Base):
+    """Кеш витягнутого вмісту сторінок, спільний для всіх пошуків (ключ - URL)."""
+    __tablename__ = 'page_cache'
+
+    url = Column(Text, primary_key=True)
+    title = Column(Text)
+    icon_url = Column(Text)
+    content = Column(Text)
+    etag = Column(Text)
+    last_modified = Column(Text)
+    fetched_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<PageCache(url='{self.url}', fetched_at='{self.fetched_at}')>"
+
+class FaviconCache(Base):
+    """Іконки сайтів за origin (scheme://host). icon_url = NULL означає, що іконку знайти не вдалося."""
+    __tablename__ = 'favicon_cache'
+
+    origin = Column(Text, primary_key=True)
+    icon_url = Column(Text)
+    fetched_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<FaviconCache(origin='{self.origin}', icon_url='{self.icon_url}')>"
+
+class GeminiCache(Base):
+    """Збережені відповіді Gemini; key - хеш моделі, режиму та промпту."""
+    __tablename__ = 'gemini_cache'
+
+    key = Column(String(64), primary_key=True)
+    response = Column(Text)
+    created_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<GeminiCache(key='{self.key}', created_at='{self.created_at}')>"
+
+# Повнотекстовий індекс FTS5 над webpages (external content), синхронізується тригерами
+FTS_STATEMENTS = [
+    """CREATE VIRTUAL TABLE webpages_fts USING fts5(
+        title, content, content='webpages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS webpages_fts_insert AFTER INSERT ON webpages BEGIN
+        INSERT INTO webpages_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS webpages_fts_delete AFTER DELETE ON webpages BEGIN
+        INSERT INTO webpages_fts(webpages_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS webpages_fts_update AFTER UPDATE ON webpages BEGIN
+        INSERT INTO webpages_fts(webpages_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO webpages_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+def create_fts_index():
+    """Створює FTS5 індекс і тригери; для існуючої БД індексує вже збережені сторінки."""
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='webpages_fts'"
+            )).first()
+            if exists:
+                return
+            for statement in FTS_STATEMENTS:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO webpages_fts(webpages_fts) VALUES ('rebuild')"))
+    except Exception as e:
+        # SQLite без FTS5: пошук по джерелах просто не працюватиме
+        logging.error(f"Не вдалося створити FTS5 індекс: {e}")
+
+def _migrate_webpages_search_index(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_webpages_search_id ON webpages (search_id)"))
+
+def _migrate_chat_history_to_messages(conn):
+    """Переносить JSON з searches.chat_history у таблицю messages."""
+    rows = conn.execute(text("SELECT id, chat_history FROM searches WHERE chat_history IS NOT NULL")).fetchall()
+    for search_id, chat_history in rows:
+        has_messages = conn.execute(text("SELECT 1 FROM messages WHERE search_id = :search_id LIMIT 1"),
+                                    {'search_id': search_id}).first()
+        if not has_messages:
+            try:
+                messages = json.loads(chat_history)
+            except ValueError:
+                logging.error(f"Пошкоджена історія чату для пошуку {search_id}")
+                messages = []
+            if messages:
+                conn.execute(
+                    text("INSERT INTO messages (search_id, role, content, created_at) "
+                         "VALUES (:search_id, :role, :content, :created_at)"),
+                    [{'search_id': search_id, 'role': m['role'], 'content': m['content'],
+                      'created_at': datetime.utcnow()} for m in messages]
+                )
+        conn.execute(text("UPDATE searches SET chat_history = NULL WHERE id = :search_id"),
+                     {'search_id': search_id})
+
+def _migrate_webpages_fingerprint(conn):
+    _add_column(conn, 'webpages', 'fingerprint', 'INTEGER')
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_webpages_fingerprint ON webpages (fingerprint)"))
+
+def _add_column(conn, table, column, column_type):
+    columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+def _migrate_rendered_html(conn):
+    # Старі записи отримують HTML ліниво, через кеш рендерингу
+    _add_column(conn, 'searches', 'response_html', 'TEXT')
+    _add_column(conn, 'messages', 'content_html', 'TEXT')
+
+def _migrate_search_timings(conn):
+    _add_column(conn, 'searches', 'timings', 'TEXT')
+
+def _migrate_search_crawl_budget(conn):
+    _add_column(conn, 'searches', 'crawl_budget', 'TEXT')
+
+def _migrate_drop_fingerprint_index(conn):
+    # B-дерево впорядковує відбитки як числа і не допомагає шукати за відстанню Геммінга
+    conn.execute(text("DROP INDEX IF EXISTS ix_webpages_fingerprint"))
+
+# Міграції схеми по порядку; номер застосованої зберігається в PRAGMA user_version.
+# Нові міграції лише додаються в кінець списку.
+MIGRATIONS = [
+    _migrate_webpages_search_index,
+    _migrate_chat_history_to_messages,
+    _migrate_webpages_fingerprint,
+    _migrate_rendered_html,
+    _migrate_search_timings,
+    _migrate_search_crawl_budget,
+    _migrate_drop_fingerprint_index,
+]
+
+def run_migrations():
+    """Оновлює існуючу БД до поточної схеми; кожна міграція виконується в окремій транзакції."""
+    with engine.connect() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+        logging.info(f"Застосовано міграцію БД {number}: {migration.__name__}")
+
 def create_tables():
+    # create_all створює лише відсутні таблиці; зміни існуючих таблиць робить run_migrations
     Base.metadata.create_all(engine)
+    run_migrations()
+    create_fts_index()
+
+# Одна фабрика сесій на процес; кожен запит/потік отримує власну сесію
+SessionLocal = sessionmaker(bind=engine)
 
 def get_session():
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return SessionLocal()
+
+def upsert(session, model, values):
+    """
+    Вставляє рядок або оновлює наявний з тим самим первинним ключем одним
+    INSERT ... ON CONFLICT DO UPDATE. На відміну від session.merge (SELECT, потім INSERT)
+    не дає IntegrityError, коли той самий ключ одночасно пишуть кілька потоків.
+    Для інших СУБД - звичайний merge. Коміт робить викликач.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        session.merge(model(**values))
+        return
+    keys = [column.name for column in model.__table__.primary_key.columns]
+    statement = insert(model.__table__).values(**values)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: statement.excluded[name] for name in values if name not in keys},
+    ))
 
 if __name__ == '__main__':
     create_tables()
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import re
+from collections import Counter
+
+# Сторінки з подібністю SimHash не нижче порогу вважаються дублікатами (дзеркала, передруки)
+DEDUP_SIMILARITY = float(os.environ.get('DEEPSCOUT_DEDUP_SIMILARITY', 0.95))
+SHINGLE_SIZE = 3
+FINGERPRINT_BITS = 64
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def _shingles(text):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return Counter([' '.join(words)]) if words else Counter()
+    return Counter(' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+def simhash(text):
+    """
+    64-бітний SimHash тексту по шинглах з SHINGLE_SIZE слів.
+    Повертає знакове ціле, щоб значення вміщалось у SQLite INTEGER.
+    """
+    # Ваги накопичуються окремо для кожного байта хешу, а на біти розкладаються в кінці:
+    # так на шингл припадає 8 операцій замість 64
+    byte_weights = [Counter() for _ in range(FINGERPRINT_BITS // 8)]
+    for shingle, weight in _shingles(text).items():
+        digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=FINGERPRINT_BITS // 8).digest()
+        for position, value in enumerate(digest):
+            byte_weights[position][value] += weight
+
+    total = sum(byte_weights[0].values())
+    fingerprint = 0
+    for position, weights in enumerate(byte_weights):
+        for bit in range(8):
+            set_weight = sum(weight for value, weight in weights.items() if value >> bit & 1)
+            # Біт встановлюється, якщо шингли з цим бітом переважують решту
+            if set_weight * 2 > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    if fingerprint >= 1 << (FINGERPRINT_BITS - 1):
+        fingerprint -= 1 << FINGERPRINT_BITS
+    return fingerprint
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & ((1 << FINGERPRINT_BITS) - 1)).count('1')
+
+def similarity(a, b):
+    return 1 - hamming_distance(a, b) / FINGERPRINT_BITS
+
+def drop_near_duplicates(pages, threshold=DEDUP_SIMILARITY):
+    """
+    Залишає першу сторінку з кожної групи майже однакових (порядок pages важливий).
+    pages - список словників з полями 'content' і, можливо, 'fingerprint';
+    відсутні відбитки обчислюються і записуються в словник.
+    Повертає (унікальні сторінки, відкинуті дублікати).
+    """
+    kept = []
+    dropped = []
+    for page in pages:
+        if page.get('fingerprint') is None:
+            page['fingerprint'] = simhash(page['content'])
+        if any(similarity(page['fingerprint'], other['fingerprint']) >= threshold for other in kept):
+            dropped.append(page)
+        else:
+            kept.append(page)
+    return kept, dropped
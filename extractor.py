@@ -0,0 +1,296 @@
+import codecs
+import logging
+import os
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from bs4.dammit import EncodingDetector, UnicodeDammit
+
+try:
+    from lxml import etree
+except ImportError:  # lxml необов'язковий: без нього працює вбудований html.parser
+    etree = None
+
+# auto - lxml, якщо встановлено, інакше html.parser; можна задати явно
+HTML_PARSER = os.environ.get('DEEPSCOUT_HTML_PARSER', 'auto')
+# Скільки перших байтів документа переглядати в пошуках <meta charset>
+SNIFF_BYTES = 4096
+
+# Вміст цих тегів ніколи не потрапляє в текст
+SKIP_TAGS = {'script', 'style', 'head', 'title', 'header', 'footer', 'nav', 'noscript', 'template'}
+# Межі блоків: текст до і після них іде окремими рядками
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'body', 'br', 'dd', 'div', 'dl', 'dt',
+              'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'header', 'hr', 'html', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td',
+              'th', 'tr', 'ul'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'param', 'source', 'track', 'wbr'}
+# Теги, початок яких неявно закриває відкритий <p> (для html.parser, який цього не робить)
+P_CLOSERS = {'address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset', 'footer', 'form',
+             'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol', 'p', 'pre',
+             'section', 'table', 'ul'}
+# Контейнери основного вмісту і класи, за якими їх впізнаємо
+CONTAINER_TAGS = {'main', 'article', 'div'}
+CONTENT_CLASSES = {'content', 'main-content', 'article-content', 'post-content',
+                   'entry-content', 'page-content', 'main'}
+# Текст посилань у контейнері рахується зі штрафом: меню і списки посилань - не вміст
+LINK_PENALTY = 2
+# Абзаців має бути хоча б стільки символів, щоб обійтись без тексту всієї сторінки
+MIN_PARAGRAPHS_CHARS = 100
+
+class _BlockCollector:
+    """
+    Один прохід по подіях парсера (start/end/data): збирає рядки тексту, межі абзаців
+    і контейнерів, а також <title> та іконку з <link>. Інтерфейс сумісний з target
+    парсера lxml; для html.parser події передає _StdlibParser.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.paragraphs = []  # (перший рядок, кінець)
+        self.containers = []  # (бал, порядок, перший рядок, кінець)
+        self.title = None
+        self.icon_href = None
+        self.touch_icon_href = None
+        self._inline = []
+        self._stack = []  # [tag, перший рядок, символів тексту, символів у посиланнях, чи контейнер]
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._in_title = False
+        self._title_parts = []
+
+    def _flush(self):
+        if self._inline:
+            # split/join помітно швидші за регулярний вираз на великих сторінках
+            line = ' '.join(''.join(self._inline).split())
+            self._inline = []
+            if line:
+                self.lines.append(line)
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag == 'link':
+            self._link_tag(attrib)
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS and not self._skip_depth:
+                self._flush()
+            return
+        if tag in BLOCK_TAGS and not self._skip_depth:
+            self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'a':
+            self._link_depth += 1
+        is_container = tag in CONTAINER_TAGS and \
+            bool(CONTENT_CLASSES.intersection((attrib.get('class') or '').split()))
+        self._stack.append([tag, len(self.lines), 0, 0, is_container])
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = ' '.join(''.join(self._title_parts).split()) or None
+        if tag in VOID_TAGS:
+            return
+        # Закриваємо все до відповідного тегу; закриття без відкриття ігноруємо
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                while len(self._stack) > index:
+                    self._close(self._stack.pop())
+                return
+
+    def _close(self, frame):
+        tag, first_line, text_chars, link_chars, is_container = frame
+        if tag in BLOCK_TAGS and not self._skip_depth:
+            self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth -= 1
+        elif tag == 'a':
+            self._link_depth -= 1
+        if self._skip_depth:
+            return
+        if tag == 'p':
+            self.paragraphs.append((first_line, len(self.lines)))
+        elif is_container:
+            score = text_chars - LINK_PENALTY * link_chars
+            self.containers.append((score, -len(self.containers), first_line, len(self.lines)))
+        # Батьківський елемент отримує статистику дочірнього
+        if self._stack:
+            self._stack[-1][2] += text_chars
+            self._stack[-1][3] += link_chars
+
+    def data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        if self._skip_depth:
+            return
+        self._inline.append(data)
+        if self._stack:
+            chars = len(data.strip())
+            self._stack[-1][2] += chars
+            if self._link_depth:
+                self._stack[-1][3] += chars
+
+    def _link_tag(self, attrib):
+        rel = (attrib.get('rel') or '').lower().split()
+        href = attrib.get('href')
+        if not href:
+            return
+        if 'icon' in rel and self.icon_href is None:
+            self.icon_href = href
+        elif 'apple-touch-icon' in rel and self.touch_icon_href is None:
+            self.touch_icon_href = href
+
+    def innermost(self, tags):
+        """Найглибший відкритий тег з tags або None."""
+        for frame in reversed(self._stack):
+            if frame[0] in tags:
+                return frame[0]
+        return None
+
+    def close(self):
+        while self._stack:
+            self._close(self._stack.pop())
+        self._flush()
+        return self
+
+    def best_text(self):
+        """
+        Вибір основного тексту: найкращий за балом контейнер з класом вмісту,
+        інакше абзаци, якщо їх достатньо, інакше весь текст сторінки.
+        """
+        if self.containers:
+            score, _, first_line, end = max(self.containers)
+            if score > 0:
+                return '\n'.join(self.lines[first_line:end])
+
+        paragraphs = [' '.join(self.lines[first_line:end]) for first_line, end in self.paragraphs]
+        text = '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+        if len(text) > MIN_PARAGRAPHS_CHARS:
+            return text
+
+        return '\n'.join(self.lines)
+
+class _StdlibParser(HTMLParser):
+    """Передає події html.parser у _BlockCollector, доповнюючи неявні закриття тегів."""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        if tag in P_CLOSERS and self.collector.innermost({'p'}):
+            self.collector.end('p')
+        elif tag == 'li' and self.collector.innermost({'li', 'ul', 'ol'}) == 'li':
+            self.collector.end('li')
+        self.collector.start(tag, {name: value or '' for name, value in attrs})
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+def available_parsers():
+    return ['lxml', 'html.parser'] if etree is not None else ['html.parser']
+
+def _resolve_parser(parser):
+    parser = parser or HTML_PARSER
+    if parser == 'auto':
+        return 'lxml' if etree is not None else 'html.parser'
+    if parser == 'lxml' and etree is None:
+        logging.warning("lxml не встановлено, використовуємо html.parser")
+        return 'html.parser'
+    return parser
+
+def detect_encoding(prefix, declared=None):
+    """
+    Кодування документа за першими байтами: charset із заголовка, BOM, <meta charset>;
+    без оголошення - UTF-8, якщо початок ним декодується, інакше вгадує UnicodeDammit.
+    """
+    for candidate in (declared, EncodingDetector.find_declared_encoding(prefix, is_html=True)):
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                pass
+    _, bom_encoding = EncodingDetector.strip_byte_order_mark(prefix)
+    if bom_encoding:
+        return 'utf-8-sig' if bom_encoding == 'utf-8' else bom_encoding
+    try:
+        # final=False: префікс може обриватись посеред багатобайтового символу
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return UnicodeDammit(prefix, is_html=True).original_encoding or 'windows-1252'
+
+def _open_parser(collector, parser):
+    if _resolve_parser(parser) == 'lxml':
+        return etree.HTMLParser(target=collector, remove_comments=True, remove_pis=True)
+    return _StdlibParser(collector)
+
+def parse_stream(chunks, encoding=None, parser=None):
+    """
+    Розбирає HTML, що надходить шматками байтів (наприклад, з мережі), не збираючи
+    документ цілком: шматки декодуються інкрементально і одразу йдуть у парсер.
+    encoding - charset із заголовка Content-Type, якщо відомий. Повертає _BlockCollector.
+    """
+    collector = _BlockCollector()
+    html_parser = _open_parser(collector, parser)
+    prefix = b''
+    decoder = None
+    fed = False
+    for chunk in chunks:
+        if decoder is None:
+            # Кодування визначаємо, коли набралось достатньо байтів для пошуку <meta charset>
+            prefix += chunk
+            if len(prefix) < SNIFF_BYTES:
+                continue
+            decoder = codecs.getincrementaldecoder(detect_encoding(prefix, encoding))(errors='replace')
+            chunk, prefix = prefix, b''
+        text = decoder.decode(chunk)
+        if text:
+            html_parser.feed(text)
+            fed = True
+    if decoder is None:
+        decoder = codecs.getincrementaldecoder(detect_encoding(prefix, encoding))(errors='replace')
+    text = decoder.decode(prefix, final=True)
+    if text:
+        html_parser.feed(text)
+        fed = True
+    # lxml не приймає порожній документ, тож без даних парсер не закриваємо
+    if fed:
+        html_parser.close()
+    return collector.close()
+
+def parse(html, parser=None):
+    """Розбирає HTML (bytes або str) за один прохід і повертає _BlockCollector."""
+    if isinstance(html, bytes):
+        return parse_stream([html], parser=parser)
+    collector = _BlockCollector()
+    if html:
+        html_parser = _open_parser(collector, parser)
+        html_parser.feed(html)
+        html_parser.close()
+    return collector.close()
+
+def _result(page, url):
+    icon_link = page.icon_href or page.touch_icon_href
+    if icon_link and url:
+        icon_link = urljoin(url, icon_link)
+    return {'content': page.best_text(), 'title': page.title, 'icon_link': icon_link}
+
+def extract_stream(chunks, url=None, encoding=None, parser=None):
+    """Як extract, але для HTML, що надходить шматками байтів (див. parse_stream)."""
+    return _result(parse_stream(chunks, encoding, parser), url)
+
+def extract(html, url=None, parser=None):
+    """
+    Витягує з HTML основний текст, заголовок та посилання на іконку за один прохід.
+    Повертає словник {'content', 'title', 'icon_link'}; icon_link абсолютний, якщо задано url.
+    """
+    return _result(parse(html, parser), url)
+
+def extract_text(html, parser=None):
+    return parse(html, parser).best_text()
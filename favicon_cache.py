@@ -0,0 +1,78 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from database import get_session, upsert, FaviconCache
+from metrics import count_cache_lookup
+
+# Іконки майже не змінюються, тому TTL довгий; невдачі кешуємо коротше
+FAVICON_TTL = timedelta(seconds=int(os.environ.get('DEEPSCOUT_FAVICON_TTL', 30 * 24 * 60 * 60)))
+FAVICON_NEGATIVE_TTL = timedelta(seconds=int(os.environ.get('DEEPSCOUT_FAVICON_NEGATIVE_TTL', 24 * 60 * 60)))
+FAVICON_LRU_SIZE = int(os.environ.get('DEEPSCOUT_FAVICON_LRU_SIZE', 1024))
+
+_lru = OrderedDict()  # origin -> (icon_url або None, fetched_at)
+_lru_lock = threading.Lock()
+
+def origin_of(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+def _is_fresh(icon_url, fetched_at, now):
+    ttl = FAVICON_TTL if icon_url else FAVICON_NEGATIVE_TTL
+    return fetched_at is not None and now - fetched_at < ttl
+
+def _remember(origin, icon_url, fetched_at):
+    with _lru_lock:
+        _lru[origin] = (icon_url, fetched_at)
+        _lru.move_to_end(origin)
+        while len(_lru) > FAVICON_LRU_SIZE:
+            _lru.popitem(last=False)
+
+def get_cached_favicon(url):
+    """
+    Шукає іконку для origin сторінки в кеші (спочатку пам'ять, потім БД).
+    Повертає (hit, icon_url); при hit=True icon_url=None означає закешовану невдачу.
+    """
+    origin = origin_of(url)
+    now = datetime.utcnow()
+
+    with _lru_lock:
+        entry = _lru.get(origin)
+        if entry is not None:
+            _lru.move_to_end(origin)
+    if entry is not None and _is_fresh(entry[0], entry[1], now):
+        count_cache_lookup('favicon', True)
+        return True, entry[0]
+
+    session = get_session()
+    try:
+        row = session.query(FaviconCache).get(origin)
+        if row is not None and _is_fresh(row.icon_url, row.fetched_at, now):
+            _remember(origin, row.icon_url, row.fetched_at)
+            count_cache_lookup('favicon', True)
+            return True, row.icon_url
+    except Exception as e:
+        logging.error(f"Помилка при читанні кешу іконок для {origin}: {e}")
+    finally:
+        session.close()
+    count_cache_lookup('favicon', False)
+    return False, None
+
+def store_favicon(url, icon_url):
+    """Зберігає іконку (або невдачу, якщо icon_url=None) для origin сторінки."""
+    origin = origin_of(url)
+    fetched_at = datetime.utcnow()
+    _remember(origin, icon_url, fetched_at)
+
+    session = get_session()
+    try:
+        # upsert: іконку того самого сайту можуть одночасно зберігати кілька потоків завантаження
+        upsert(session, FaviconCache, {'origin': origin, 'icon_url': icon_url, 'fetched_at': fetched_at})
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Помилка при збереженні іконки для {origin}: {e}")
+    finally:
+        session.close()
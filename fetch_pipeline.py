@@ -0,0 +1,133 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Налаштування паралельного завантаження сторінок
+MAX_WORKERS = int(os.environ.get('DEEPSCOUT_FETCH_WORKERS', 8))
+MAX_PER_HOST = int(os.environ.get('DEEPSCOUT_FETCH_PER_HOST', 2))
+FETCH_DEADLINE = float(os.environ.get('DEEPSCOUT_FETCH_DEADLINE', 90))
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+class FetchPipeline:
+    """
+    Паралельне завантаження сторінок з обмеженням загальної кількості потоків,
+    кількості одночасних запитів до одного хоста і загальним дедлайном.
+
+    Використання:
+        pipeline = FetchPipeline(process_url)
+        for url in urls:
+            pipeline.submit(url)
+        for index, url, result in pipeline.as_completed():
+            ...
+
+    `worker(url)` виконується у фоновому потоці; виняток у worker дає result=None.
+    Після close() подія `cancelled` встановлена: worker може перевіряти її, щоб
+    перервати вже розпочате завантаження.
+    """
+
+    def __init__(self, worker, max_workers=MAX_WORKERS, per_host=MAX_PER_HOST, deadline=FETCH_DEADLINE):
+        self.worker = worker
+        self.per_host = max(1, per_host)
+        self.deadline = time.monotonic() + deadline
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='fetch')
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._active = {}  # host -> кількість запитів, що виконуються
+        self._waiting = {}  # host -> черга (index, url), що чекають на вільне місце
+        self._submitted = 0
+        self._finished = 0
+        self._closed = False
+        self.cancelled = threading.Event()
+
+    @property
+    def pending(self):
+        """Скільки поданих URL ще не повернули результат."""
+        with self._lock:
+            return self._submitted - self._finished
+
+    def submit(self, url):
+        """Додає URL у чергу завантаження і повертає його порядковий номер."""
+        host = host_of(url)
+        with self._lock:
+            index = self._submitted
+            self._submitted += 1
+            if self._active.get(host, 0) < self.per_host:
+                self._active[host] = self._active.get(host, 0) + 1
+                start = True
+            else:
+                self._waiting.setdefault(host, deque()).append((index, url))
+                start = False
+        if start:
+            self._start(index, url, host)
+        return index
+
+    def _start(self, index, url, host):
+        if self._closed:
+            return
+        try:
+            self._executor.submit(self._run, index, url, host)
+        except RuntimeError:
+            # Пул уже зупинено (дедлайн минув)
+            pass
+
+    def _run(self, index, url, host):
+        result = None
+        try:
+            if time.monotonic() < self.deadline and not self.cancelled.is_set():
+                result = self.worker(url)
+        except Exception as e:
+            logging.error(f"Помилка при завантаженні {url}: {e}")
+        finally:
+            self._results.put((index, url, result))
+            next_item = None
+            with self._lock:
+                waiting = self._waiting.get(host)
+                if waiting:
+                    next_item = waiting.popleft()
+                else:
+                    self._active[host] -= 1
+            if next_item:
+                self._start(next_item[0], next_item[1], host)
+
+    def as_completed(self):
+        """
+        Повертає (index, url, result) в міру завершення завантажень.
+        Зупиняється, коли всі подані URL оброблено або минув дедлайн.
+        """
+        try:
+            while True:
+                with self._lock:
+                    if self._finished >= self._submitted:
+                        return
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(f"Дедлайн завантаження сторінок вичерпано, "
+                                    f"не дочекались {self._submitted - self._finished} сторінок")
+                    return
+                try:
+                    item = self._results.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                with self._lock:
+                    self._finished += 1
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Скасовує завдання, що ще не стартували, і встановлює cancelled для запущених;
+        запущені потоки завершаться у фоні.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.cancelled.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
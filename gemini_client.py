@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import google.generativeai as genai
+from database import get_session, upsert, GeminiCache
+from metrics import GEMINI_TOKENS, count_cache_lookup
+
+MODEL_NAME = 'gemini-2.0-flash'
+
+# Кеш відповідей: розмір LRU у пам'яті, час життя і чи зберігати в SQLite
+CACHE_SIZE = int(os.environ.get('DEEPSCOUT_GEMINI_CACHE_SIZE', 256))
+CACHE_TTL = timedelta(seconds=int(os.environ.get('DEEPSCOUT_GEMINI_CACHE_TTL', 6 * 60 * 60)))
+CACHE_PERSIST = os.environ.get('DEEPSCOUT_GEMINI_CACHE_PERSIST', '1') == '1'
+
+class GeminiClient:
+    """Довгоживучий клієнт Gemini: модель створюється один раз для ключа API."""
+
+    def __init__(self, api_key, model_name=MODEL_NAME):
+        self.api_key = api_key
+        self.model_name = model_name
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        count_tokens(response)
+        return response.text.strip()
+
+    def generate_stream(self, prompt):
+        chunk = None
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+        # usage_metadata останнього шматка містить підсумок для всієї відповіді
+        if chunk is not None:
+            count_tokens(chunk)
+
+def count_tokens(response):
+    """Додає токени запиту і відповіді з usage_metadata до метрик, якщо вони є."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    GEMINI_TOKENS.inc(getattr(usage, 'prompt_token_count', 0) or 0, kind='prompt')
+    GEMINI_TOKENS.inc(getattr(usage, 'candidates_token_count', 0) or 0, kind='completion')
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_gemini_client(api_key):
+    """Повертає спільний клієнт; перебудовує його лише якщо змінився ключ."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.api_key != api_key:
+            _client = GeminiClient(api_key)
+        return _client
+
+def set_gemini_client(client):
+    """
+    Підставляє власний клієнт (наприклад, детермінований фейк для офлайн-бенчмарку).
+    Клієнт має мати api_key, generate(prompt) і generate_stream(prompt).
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+def reset_gemini_client():
+    """Викликається при зміні ключа в налаштуваннях."""
+    global _client
+    with _client_lock:
+        _client = None
+
+class ResponseCache:
+    """LRU кеш відповідей з TTL і необов'язковим збереженням у SQLite."""
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, persist=CACHE_PERSIST):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist = persist
+        self._entries = OrderedDict()  # key -> (response, created_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name, mode, prompt):
+        return hashlib.sha256(f"{model_name}\0{mode}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _is_fresh(self, created_at):
+        return datetime.utcnow() - created_at < self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[1]):
+                    self._entries.move_to_end(key)
+                    count_cache_lookup('gemini', True)
+                    return entry[0]
+                del self._entries[key]
+
+        if not self.persist:
+            count_cache_lookup('gemini', False)
+            return None
+        session = get_session()
+        try:
+            row = session.query(GeminiCache).get(key)
+            if row is not None and self._is_fresh(row.created_at):
+                self._remember(key, row.response, row.created_at)
+                count_cache_lookup('gemini', True)
+                return row.response
+        except Exception as e:
+            logging.error(f"Помилка при читанні кешу Gemini: {e}")
+        finally:
+            session.close()
+        count_cache_lookup('gemini', False)
+        return None
+
+    def put(self, key, response):
+        created_at = datetime.utcnow()
+        self._remember(key, response, created_at)
+        if not self.persist:
+            return
+        session = get_session()
+        try:
+            upsert(session, GeminiCache, {'key': key, 'response': response, 'created_at': created_at})
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Помилка при збереженні кешу Gemini: {e}")
+        finally:
+            session.close()
+
+    def _remember(self, key, response, created_at):
+        with self._lock:
+            self._entries[key] = (response, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+response_cache = ResponseCache()
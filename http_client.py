@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import BYTES_DOWNLOADED
+
+# Налаштування спільного HTTP клієнта для всіх запитів скрапінгу
+CONNECT_TIMEOUT = float(os.environ.get('DEEPSCOUT_HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('DEEPSCOUT_HTTP_READ_TIMEOUT', 15))
+MAX_RETRIES = int(os.environ.get('DEEPSCOUT_HTTP_RETRIES', 2))
+BACKOFF_FACTOR = float(os.environ.get('DEEPSCOUT_HTTP_BACKOFF', 0.5))
+POOL_CONNECTIONS = int(os.environ.get('DEEPSCOUT_HTTP_POOL_CONNECTIONS', 32))  # кількість хостів у пулі
+POOL_MAXSIZE = int(os.environ.get('DEEPSCOUT_HTTP_POOL_MAXSIZE', 4))  # з'єднань на один хост
+MAX_BODY_BYTES = int(os.environ.get('DEEPSCOUT_HTTP_MAX_BYTES', 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'uk-UA,uk;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://www.google.com/'
+}
+
+def build_session():
+    """requests.Session з keep-alive пулом з'єднань і повторними спробами з backoff."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """Спільна для процесу сесія, щоб перевикористовувати TCP/TLS з'єднання."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+def _timeout(timeout):
+    if timeout is None:
+        return (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if isinstance(timeout, tuple):
+        return timeout
+    return (min(CONNECT_TIMEOUT, timeout), timeout)
+
+def http_stream(url, headers=None, timeout=None):
+    """
+    GET без читання тіла: заголовки вже доступні, тіло читається через iter_body.
+    Викликач має закрити відповідь (response.close() або with).
+    """
+    return get_http_session().get(url, headers=headers, timeout=_timeout(timeout), stream=True)
+
+def iter_body(response, max_bytes=MAX_BODY_BYTES, cancelled=None):
+    """
+    Шматки тіла відповіді, сумарно не більше max_bytes.
+    cancelled - необов'язкова threading.Event: якщо її встановлено, читання припиняється.
+    """
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if cancelled is not None and cancelled.is_set():
+                logging.info(f"Завантаження {response.url} скасовано")
+                return
+            if max_bytes and received + len(chunk) >= max_bytes:
+                logging.info(f"Відповідь {response.url} обрізано до {max_bytes} байт")
+                chunk = chunk[:max_bytes - received]
+                received += len(chunk)
+                yield chunk
+                return
+            received += len(chunk)
+            yield chunk
+    finally:
+        # Лічильник оновлюємо раз на відповідь, а не на кожен шматок
+        BYTES_DOWNLOADED.inc(received)
+
+def content_type_of(response):
+    """(MIME тип у нижньому регістрі або '', charset або None) із заголовка Content-Type."""
+    mime, _, params = (response.headers.get('Content-Type') or '').partition(';')
+    charset = None
+    for param in params.split(';'):
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset' and value.strip():
+            charset = value.strip().strip('"\'')
+    return mime.strip().lower(), charset
+
+def content_length_of(response):
+    try:
+        return int(response.headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+def http_get(url, headers=None, timeout=None, max_bytes=MAX_BODY_BYTES):
+    """
+    GET через спільну сесію. Тіло читається потоково і обрізається на max_bytes,
+    тож response.content ніколи не перевищує ліміт.
+    """
+    response = http_stream(url, headers=headers, timeout=timeout)
+    try:
+        response._content = b''.join(iter_body(response, max_bytes))
+        response._content_consumed = True
+    finally:
+        response.close()
+    return response
+
+def http_head(url, headers=None, timeout=None):
+    return get_http_session().head(url, headers=headers, timeout=_timeout(timeout), allow_redirects=True)
@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Скільки глибоких пошуків виконується одночасно і скільки може чекати в черзі
+JOB_WORKERS = int(os.environ.get('DEEPSCOUT_JOB_WORKERS', 2))
+JOB_QUEUE_SIZE = int(os.environ.get('DEEPSCOUT_JOB_QUEUE_SIZE', 20))
+# Завершені завдання зберігаються в пам'яті обмежений час
+JOB_RETENTION = int(os.environ.get('DEEPSCOUT_JOB_RETENTION', 60 * 60))
+
+class JobQueueFull(Exception):
+    """Черга фонових завдань заповнена."""
+
+class Job:
+    """Стан фонового завдання, який читає ендпоінт статусу."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = 'queued'  # queued -> running -> done | error
+        self.stage = 'queued'
+        self.details = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, stage, **details):
+        """Колбек прогресу: stage - назва етапу, details - довільні числа (current, total, ...)."""
+        with self._lock:
+            self.stage = stage
+            self.details.update(details)
+            self.updated_at = time.time()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'details': dict(self.details),
+                'result': self.result,
+                'error': self.error,
+            }
+
+class JobRunner:
+    """
+    Пул потоків для довгих завдань з обмеженою чергою.
+    func викликається як func(job, *args, **kwargs); її результат стає job.result.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='job')
+        self.max_pending = max(1, max_workers) + max(0, max_queue)
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, **kwargs):
+        with self._lock:
+            self._cleanup()
+            if self._pending >= self.max_pending:
+                raise JobQueueFull("Забагато завдань у черзі, спробуйте пізніше")
+            job = Job(name)
+            self._jobs[job.id] = job
+            self._pending += 1
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'done'
+            job.update('done')
+        except Exception as e:
+            logging.exception(f"Помилка у фоновому завданні {job.name} ({job.id})")
+            job.error = str(e)
+            job.status = 'error'
+            job.update('error')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _cleanup(self):
+        expire_before = time.time() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in ('done', 'error') and job.updated_at < expire_before]:
+            del self._jobs[job_id]
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_job_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
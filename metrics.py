@@ -0,0 +1,209 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Межі бакетів гістограм тривалості, секунди
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Content-Type текстового формату Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # значення міток -> стан метрики
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+class Counter(_Metric):
+    """Лічильник, що лише зростає; окреме значення для кожного набору міток."""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self, key, value):
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    """Гістограма з фіксованими бакетами, як у клієнтах Prometheus."""
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # бакети, сума, кількість
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{self._labels(key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Усі метрики в текстовому форматі Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+SPAN_SECONDS = registry.register(Histogram(
+    'deepscout_span_seconds', 'Тривалість етапів обробки (span)', ('span',)))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    'deepscout_http_request_seconds', 'Тривалість обробки запитів Flask', ('endpoint', 'method', 'status')))
+PAGES_FETCHED = registry.register(Counter(
+    'deepscout_pages_fetched_total', 'Оброблені сторінки за джерелом вмісту (requests, selenium, fallback, cache...)',
+    ('source',)))
+BYTES_DOWNLOADED = registry.register(Counter(
+    'deepscout_bytes_downloaded_total', 'Байти тіл HTTP відповідей, прочитані при скрапінгу'))
+GEMINI_TOKENS = registry.register(Counter(
+    'deepscout_gemini_tokens_total', 'Токени Gemini за usage_metadata відповіді', ('kind',)))
+CACHE_LOOKUPS = registry.register(Counter(
+    'deepscout_cache_lookups_total', 'Звернення до кешів: hit або miss', ('cache', 'result')))
+
+def count_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+_local = threading.local()
+
+class SearchTrace:
+    """
+    Розбивка часу одного пошуку по span: кількість і сумарні секунди для кожної назви.
+    Span з паралельних потоків (сторінки, видачі) сумуються, тож їх сума може
+    перевищувати загальний час; total - реальний час від створення.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self._spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def to_dict(self):
+        with self._lock:
+            spans = {name: {'count': count, 'seconds': round(seconds, 4)}
+                     for name, (count, seconds) in sorted(self._spans.items())}
+        return {'total': round(time.perf_counter() - self.started, 4), 'spans': spans}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+@contextmanager
+def activate(trace):
+    """Робить trace поточним для цього потоку: у нього потрапляють усі span."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+def bind_trace(func):
+    """
+    Обгортає func так, щоб у будь-якому потоці вона виконувалась з поточним trace
+    потоку, що її обгорнув (для завдань ThreadPoolExecutor).
+    """
+    trace = current_trace()
+    if trace is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with activate(trace):
+            return func(*args, **kwargs)
+    return wrapper
+
+@contextmanager
+def span(name):
+    """
+    Вимірює блок коду: тривалість потрапляє в гістограму deepscout_span_seconds
+    і в trace поточного потоку, якщо він є. Працює і як декоратор.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, span=name)
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, elapsed)
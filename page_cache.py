@@ -0,0 +1,59 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from database import PageCache, upsert
+
+# Скільки часу сторінка з кешу вважається свіжою без перевірки на сервері
+PAGE_CACHE_TTL = timedelta(seconds=int(os.environ.get('DEEPSCOUT_PAGE_CACHE_TTL', 24 * 60 * 60)))
+
+def load_cached_pages(session, urls):
+    """Повертає {ключ URL: dict} для сторінок, які вже є в кеші (urls - ключі, див. normalize_url)."""
+    if not urls:
+        return {}
+    cached = {}
+    try:
+        for entry in session.query(PageCache).filter(PageCache.url.in_(list(urls))).all():
+            cached[entry.url] = {
+                'url': entry.url,
+                'title': entry.title,
+                'icon_url': entry.icon_url,
+                'content': entry.content,
+                'etag': entry.etag,
+                'last_modified': entry.last_modified,
+                'fetched_at': entry.fetched_at,
+            }
+    except Exception as e:
+        logging.error(f"Помилка при читанні кешу сторінок: {e}")
+    return cached
+
+def is_fresh(cached, now=None):
+    if not cached or not cached.get('fetched_at'):
+        return False
+    now = now or datetime.utcnow()
+    return now - cached['fetched_at'] < PAGE_CACHE_TTL
+
+def conditional_headers(cached):
+    """Заголовки для умовного GET (ревалідації застарілого запису кешу)."""
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+def save_cached_page(session, page):
+    """
+    Додає або оновлює запис кешу. Запис шукається за ключем URL (page['cache_key'],
+    див. utils.normalize_url), а не за URL сторінки. Upsert, а не merge: ту саму сторінку
+    можуть одночасно зберігати кілька пошуків. Коміт робить викликач.
+    """
+    upsert(session, PageCache, {
+        'url': page.get('cache_key') or page['url'],
+        'title': page.get('title'),
+        'icon_url': page.get('icon_url'),
+        'content': page.get('content'),
+        'etag': page.get('etag'),
+        'last_modified': page.get('last_modified'),
+        'fetched_at': datetime.utcnow(),
+    })
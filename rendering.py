@@ -0,0 +1,51 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import markdown
+from metrics import count_cache_lookup
+
+MARKDOWN_EXTENSIONS = ['extra', 'fenced_code', 'codehilite', 'smarty', 'nl2br']
+# Кеш готового HTML за хешем тексту; потрібен для записів, збережених без HTML
+RENDER_CACHE_SIZE = int(os.environ.get('DEEPSCOUT_MARKDOWN_CACHE_SIZE', 512))
+
+class RenderCache:
+    """LRU кеш HTML за sha256 вихідного Markdown."""
+
+    def __init__(self, max_size=RENDER_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+render_cache = RenderCache()
+
+def render_markdown(text):
+    """Markdown -> HTML з тими ж розширеннями, що й раніше у фільтрі convert_markdown."""
+    if not text:
+        return ''
+    key = RenderCache.make_key(text)
+    html = render_cache.get(key)
+    count_cache_lookup('markdown', html is not None)
+    if html is None:
+        # markdown.markdown створює новий Markdown на кожен виклик, тож безпечний для потоків
+        html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+        render_cache.put(key, html)
+    return html
@@ -0,0 +1,41 @@
+import logging
+import os
+from sqlalchemy import text
+from context_builder import tokenize
+
+# Скільки уривків з джерел додавати до промпту уточнюючого питання
+RETRIEVAL_TOP_K = int(os.environ.get('DEEPSCOUT_RETRIEVAL_TOP_K', 5))
+SNIPPET_TOKENS = int(os.environ.get('DEEPSCOUT_RETRIEVAL_SNIPPET_TOKENS', 48))
+
+def build_match_query(question):
+    """FTS5 запит: будь-яке зі слів питання (у лапках, щоб не зламати синтаксис MATCH)."""
+    terms = dict.fromkeys(token.replace('"', '') for token in tokenize(question))
+    return ' OR '.join(f'"{term}"' for term in terms if term)
+
+def retrieve_passages(session, search_id, question, k=RETRIEVAL_TOP_K):
+    """
+    Найрелевантніші уривки сторінок пошуку search_id для питання (ранжування bm25 з FTS5).
+    Повертає список {'url', 'title', 'passage'}; при помилці або без збігів - порожній список.
+    """
+    match_query = build_match_query(question)
+    if not match_query:
+        return []
+    try:
+        rows = session.execute(text(f"""
+            SELECT w.url, w.title,
+                   snippet(webpages_fts, 1, '', '', ' … ', {int(SNIPPET_TOKENS)}) AS passage
+            FROM webpages_fts
+            JOIN webpages w ON w.id = webpages_fts.rowid
+            WHERE webpages_fts MATCH :match AND w.search_id = :search_id
+            ORDER BY bm25(webpages_fts, 2.0, 1.0)
+            LIMIT :k
+        """), {'match': match_query, 'search_id': int(search_id), 'k': k}).fetchall()
+    except Exception as e:
+        logging.error(f"Помилка повнотекстового пошуку для search_id={search_id}: {e}")
+        return []
+    return [{'url': row.url, 'title': row.title, 'passage': row.passage} for row in rows]
+
+def format_passages(passages):
+    """Текстовий блок з уривками для промпту."""
+    return '\n\n'.join(f"[{i}] {p['title'] or p['url']} ({p['url']})\n{p['passage']}"
+                       for i, p in enumerate(passages, 1))
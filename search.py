@@ -1,27 +1,34 @@
 import logging
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import google.generativeai as genai
+import math
+import os
 import time
-from utils import get_favicon, parse_page_content
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from gemini_client import get_gemini_client, response_cache, ResponseCache, MODEL_NAME
+from utils import process_page, normalize_url
+from search_backends import get_search_backends
+from fetch_pipeline import FetchPipeline, FETCH_DEADLINE
+from crawl_budget import CrawlBudget
+from page_cache import load_cached_pages, is_fresh, save_cached_page
+from context_builder import build_context
+from dedup import simhash, drop_near_duplicates
 from database import Search, WebPage
+from metrics import span, SearchTrace, activate, bind_trace, count_cache_lookup, PAGES_FETCHED
 
 logging.basicConfig(level=logging.INFO)
 
-def get_gemini_response(query, api_key, detailed=False, context="", is_followup=False):
-    if not api_key:
-        return "Помилка: Не налаштовано API key для Gemini."
-    
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        # Concise system prompt for short, direct responses
-        system_prompt = """Ти - DeepScout AI, компактний дослідницький асистент.
+# Тайм-аути для паралельного отримання відповіді Gemini і видачі DuckDuckGo
+ANSWER_TIMEOUT = float(os.environ.get('DEEPSCOUT_ANSWER_TIMEOUT', 60))
+SERP_TIMEOUT = float(os.environ.get('DEEPSCOUT_SERP_TIMEOUT', 20))
+# Скільки підзапитів глибокого пошуку виконується одночасно
+SERP_CONCURRENCY = max(1, int(os.environ.get('DEEPSCOUT_SERP_CONCURRENCY', 3)))
+
+_shallow_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('DEEPSCOUT_SHALLOW_WORKERS', 8)),
+                                       thread_name_prefix='shallow')
+
+def build_gemini_prompt(query, detailed=False, context="", is_followup=False):
+    """Обгортає запит системним промптом DeepScout відповідно до режиму."""
+    # Concise system prompt for short, direct responses
+    system_prompt = """Ти - DeepScout AI, компактний дослідницький асистент.
 
 СТИЛЬ ВІДПОВІДЕЙ:
 - Коротко і по суті
@@ -46,8 +53,8 @@ def get_gemini_response(query, api_key, detailed=False, context="", is_followup=
 - Надмірні деталі та контекст
 - Повторення та перефразування"""
 
-        if is_followup and context:
-            followup_prompt = f"""{system_prompt}
+    if is_followup and context:
+        followup_prompt = f"""{system_prompt}
 
 РЕЖИМ FOLLOW-UP:
 Обробляєш додаткове питання в контексті розмови.
@@ -62,10 +69,10 @@ def get_gemini_response(query, api_key, detailed=False, context="", is_followup=
 НОВЕ ПИТАННЯ: "{query}"
 
 Відповідь має бути короткою (1-3 речення)."""
-            query = followup_prompt
-        
-        elif detailed:
-            enhanced_query = f"""{system_prompt}
+        query = followup_prompt
+    
+    elif detailed:
+        enhanced_query = f"""{system_prompt}
 
 РЕЖИМ ДЕТАЛЬНОГО АНАЛІЗУ:
 Надай структуровану відповідь з ключовими аспектами теми.
@@ -78,17 +85,70 @@ def get_gemini_response(query, api_key, detailed=False, context="", is_followup=
 3. Практичні моменти (якщо є)
 
 Загальний обсяг: до 10 речень."""
-            query = enhanced_query
-        else:
-            query = f"{system_prompt}\n\nЗАПИТ: {query}\n\nНадай точну та корисну відповідь."
+        query = enhanced_query
+    else:
+        query = f"{system_prompt}\n\nЗАПИТ: {query}\n\nНадай точну та корисну відповідь."
+    return query
+
+def _prompt_mode(detailed, context, is_followup):
+    if is_followup and context:
+        return 'followup'
+    return 'detailed' if detailed else 'plain'
+
+def get_gemini_response(query, api_key, detailed=False, context="", is_followup=False):
+    if not api_key:
+        return "Помилка: Не налаштовано API key для Gemini."
+    
+    try:
+        query = build_gemini_prompt(query, detailed=detailed, context=context, is_followup=is_followup)
+        
+        # Однакові промпти (наприклад, повторні підзапити для тієї ж теми) беремо з кешу
+        cache_key = ResponseCache.make_key(MODEL_NAME, _prompt_mode(detailed, context, is_followup), query)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # Generate response
-        response = model.generate_content(query)
-        return response.text.strip()
+        with span('gemini'):
+            text = get_gemini_client(api_key).generate(query)
+        response_cache.put(cache_key, text)
+        return text
     except Exception as e:
         logging.error(f"Error in get_gemini_response: {e}")
         return f"Помилка при отриманні відповіді від Gemini: {str(e)}"
 
+def stream_gemini_response(query, api_key, detailed=False, context="", is_followup=False):
+    """
+    Те саме, що get_gemini_response, але генератор: віддає текст частинами
+    в міру того, як Gemini його генерує (generate_content(stream=True)).
+    Відповідь з кешу віддається одним шматком. Помилка Gemini передається викликачу
+    винятком, а не текстом: частину відповіді вже могли віддати, і текст помилки
+    не має стати її продовженням.
+    """
+    if not api_key:
+        yield "Помилка: Не налаштовано API key для Gemini."
+        return
+    
+    try:
+        query = build_gemini_prompt(query, detailed=detailed, context=context, is_followup=is_followup)
+        cache_key = ResponseCache.make_key(MODEL_NAME, _prompt_mode(detailed, context, is_followup), query)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        with span('gemini'):
+            for chunk in get_gemini_client(api_key).generate_stream(query):
+                parts.append(chunk)
+                yield chunk
+        # У кеш потрапляє лише повністю отримана відповідь
+        response_cache.put(cache_key, ''.join(parts).strip())
+    except Exception as e:
+        logging.error(f"Error in stream_gemini_response: {e}")
+        raise
+
+@span('sub_queries')
 def generate_sub_queries(query, api_key, num_queries=5):
     """
     Generates related search queries using Gemini.
@@ -125,45 +185,167 @@ def generate_sub_queries(query, api_key, num_queries=5):
     filtered_queries = [q.strip() for q in sub_queries if q.strip() and not q.strip().startswith(('•', '-', '*', '1.', '2.', '3.', '4.', '5.'))]
     return filtered_queries[:num_queries]
 
+@span('serp')
 def search_duckduckgo(query, num_results=10):
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    """
+    Пошук у DuckDuckGo через ланцюжок бекендів: спершу швидкий HTTP бекенд,
+    а Selenium - лише якщо попередній не дав результатів або впав.
+    """
+    for backend in get_search_backends():
+        try:
+            results = backend.search(query, num_results=num_results)
+            if results:
+                return results
+            logging.info(f"Бекенд пошуку '{backend.name}' не повернув результатів для '{query}'")
+        except Exception as e:
+            logging.error(f"Помилка бекенду пошуку '{backend.name}': {e}")
+    return []
 
-    search_url = f"https://duckduckgo.com/?q={query}"
-    driver.get(search_url)
+def answer_with_search_results(prompt, search_query, api_key, detailed=True):
+    """
+    Запускає відповідь Gemini і пошук DuckDuckGo одночасно, бо вони не залежать одне від одного.
+    Кожен етап має власний тайм-аут; збій одного не зриває інший. Завдання, що не вклалось,
+    скасовується: якщо воно ще в черзі пулу, то не почнеться, а запущене завершиться
+    за власним тайм-аутом (HTTP бекенду чи клієнта Gemini), і його результат відкидається.
+    Повертає (gemini_answer, search_results).
+    """
+    started = time.monotonic()
+    answer_future = _shallow_executor.submit(get_gemini_response, prompt, api_key, detailed=detailed)
+    serp_future = _shallow_executor.submit(search_duckduckgo, search_query)
+    
+    try:
+        search_results = serp_future.result(timeout=SERP_TIMEOUT)
+    except FutureTimeoutError:
+        logging.warning(f"Пошук DuckDuckGo не вклався в {SERP_TIMEOUT} с для '{search_query}'")
+        serp_future.cancel()
+        search_results = []
+    except Exception as e:
+        logging.error(f"Помилка пошуку DuckDuckGo: {e}")
+        search_results = []
+    
+    try:
+        remaining = max(0, ANSWER_TIMEOUT - (time.monotonic() - started))
+        gemini_answer = answer_future.result(timeout=remaining)
+    except FutureTimeoutError:
+        logging.warning(f"Gemini не відповів за {ANSWER_TIMEOUT} с")
+        answer_future.cancel()
+        gemini_answer = "Помилка: Gemini не відповів вчасно. Спробуйте ще раз."
+    except Exception as e:
+        logging.error(f"Помилка при отриманні відповіді Gemini: {e}")
+        gemini_answer = f"Помилка при отриманні відповіді від Gemini: {str(e)}"
+    
+    return gemini_answer, search_results
 
-    results = []
+def fetch_page_data(url, cached=None, cancelled=None):
+    """
+    Завантажує одну сторінку: контент, заголовок та іконку за одне звернення (process_page).
+    Застарілий запис кешу (cached) ревалідується умовним GET; cancelled - подія скасування
+    (FetchPipeline.cancelled), після якої завантаження обривається.
+    Повертає словник з даними або None, якщо корисного контенту немає.
+    Викликається у фонових потоках, тому не працює з БД.
+    """
+    with span('page'):
+        page = process_page(url, cached=cached, cancelled=cancelled)
+    PAGES_FETCHED.inc(source=page['source'])
+    
+    # Пропускаємо, якщо контент занадто короткий
+    if len(page['content'].strip()) < 30:
+        print(f"Занадто короткий контент для {url}")
+        return None
+    
+    # Відбиток рахуємо тут, у потоці завантаження, а не в головному потоці
+    return dict(page, url=url, fingerprint=simhash(page['content']))
+
+# Джерела сторінок, які потрібно (пере)записати у спільний кеш
+CACHEABLE_SOURCES = ('requests', 'selenium', 'revalidated')
+
+def _page_row(search_id, page_data):
+    return WebPage(
+        search_id=search_id, 
+        url=page_data['url'], 
+        title=page_data['title'], 
+        icon_url=page_data['icon_url'], 
+        content=page_data['content'],
+        fingerprint=page_data.get('fingerprint')
+    )
+
+@span('store')
+def save_search_pages(session, search_id, pages):
+    """
+    Зберігає сторінки пошуку і оновлює спільний кеш в одній транзакції.
+    Записи кешу - upsert, тож одночасні пошуки з тими самими сторінками не конфліктують.
+    Якщо пакетний запис не вдався, сторінки записуються поодинці, кожна окремо від
+    свого запису кешу, щоб одна проблемна сторінка не втратила решту.
+    """
+    # Оновлюємо кеш лише для свіжо завантажених або ревалідованих сторінок
+    to_cache = [page for page in pages if page['source'] in CACHEABLE_SOURCES]
     try:
-        for _ in range(2):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-
-        link_elements = driver.find_elements(By.CSS_SELECTOR, "article[data-nrn='result'] a[data-testid='result-title-a']")
-        for link in link_elements[:num_results]:
-            title = link.text.strip()
-            url = link.get_attribute('href')
-            if title and url:
-                results.append({'title': title, 'url': url})
+        session.bulk_save_objects([_page_row(search_id, page) for page in pages])
+        for page in to_cache:
+            save_cached_page(session, page)
+        session.commit()
+        return
     except Exception as e:
-        logging.error(f"Помилка при отриманні результатів: {e}")
+        session.rollback()
+        logging.error(f"Помилка пакетного збереження сторінок для пошуку {search_id}: {e}")
+    
+    for page in pages:
+        try:
+            session.add(_page_row(search_id, page))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"Помилка при збереженні в БД для {page['url']}: {e}")
+            continue
+        # Кеш - окремою транзакцією: його помилка не скасовує запис сторінки
+        if page['source'] in CACHEABLE_SOURCES:
+            try:
+                save_cached_page(session, page)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Помилка при оновленні кешу для {page['url']}: {e}")
 
-    driver.quit()
-    return results
+def _no_progress(stage, **details):
+    pass
 
-def perform_deep_search(query, api_key, session):
+def perform_deep_search(query, api_key, session, progress=None):
     """
     Виконує глибокий пошук: генерує підзапити, збирає URL, витягує вміст сторінок і зберігає в БД.
-    Покращена логіка для кращого отримання контенту та обробки помилок.
+    Видачі для підзапитів збираються паралельно, і сторінки з кожної видачі одразу йдуть
+    у FetchPipeline; у БД вони записуються в порядку (підзапит, позиція у видачі).
+    Майже однакові сторінки (SimHash) відкидаються до запису і до побудови звіту.
+    У бюджетному режимі (crawl_budget.py) завантаження припиняється, щойно зібрано
+    достатньо корисного тексту або вичерпано час; решта запитів скасовується,
+    а використання бюджету зберігається в Search.crawl_budget.
+    progress(stage, **details) - необов'язковий колбек для звітування про етапи
+    (sub_queries, serp, pages, store, report).
+    Розбивка часу по етапах (див. metrics.SearchTrace) зберігається в Search.timings.
     """
+    trace = SearchTrace()
+    with activate(trace), span('deep_search'):
+        search_id = _run_deep_search(query, api_key, session, progress or _no_progress)
+    save_search_timings(session, search_id, trace)
+    return search_id
+
+def save_search_timings(session, search_id, trace):
+    try:
+        session.query(Search).get(search_id).timings = trace.to_json()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Помилка при збереженні таймінгів пошуку {search_id}: {e}")
+
+def _run_deep_search(query, api_key, session, progress):
+    budget = CrawlBudget.from_settings()
+    
     # 1. Генеруємо підзапити (обмежуємо до 3 для швидкості)
+    progress('sub_queries')
     sub_queries = generate_sub_queries(query, api_key)[:3]
 
-    all_urls = set()  # використовуємо множину для унікальних URL
-    all_content = ""
+    url_positions = {}  # ключ URL (normalize_url) -> (номер підзапиту, позиція у видачі)
+    original_urls = {}  # ключ URL -> URL з видачі, який завантажується і зберігається
+    url_keys = {}  # URL з видачі -> ключ; для кешу в потоках завантаження
     
     # Створюємо основний запис пошуку
     new_search = Search(
@@ -174,70 +356,105 @@ def perform_deep_search(query, api_key, session):
     session.add(new_search)
     session.commit()
     search_id = new_search.id
-
-    # 2. Шукаємо URL (обмежуємо до 5 на запит)
-    for sub_query in sub_queries:
-        search_results = search_duckduckgo(sub_query, num_results=5)
-        for result in search_results:
-            all_urls.add(result['url'])
-
-    successful_pages = 0
-    
-    # Створюємо нову сесію для обробки сторінок, щоб запобігти проблемам з від'єднаними об'єктами
-    if len(all_urls) > 0:
-        for url in all_urls:
+    progress('serp', search_id=search_id, current=0, total=len(sub_queries))
+
+    # 2. Шукаємо URL паралельно для всіх підзапитів (обмежуємо до 5 на запит).
+    # Сторінки починають завантажуватись одразу, щойно приходить перша видача.
+    pages_by_url = {}  # ключ URL -> дані сторінки
+    cached_pages = {}  # ключ URL -> запис кешу
+    # Span з потоків завантаження і видачі потрапляють у trace цього пошуку;
+    # дедлайн завантаження - залишок бюджету часу пошуку
+    pipeline = FetchPipeline(
+        bind_trace(lambda url: fetch_page_data(url, cached=cached_pages.get(url_keys[url]), cancelled=pipeline.cancelled)),
+        deadline=budget.remaining(FETCH_DEADLINE)
+    )
+    serp_executor = ThreadPoolExecutor(max_workers=SERP_CONCURRENCY, thread_name_prefix='serp')
+    serp_futures = {serp_executor.submit(bind_trace(search_duckduckgo), sub_query, num_results=5): i
+                    for i, sub_query in enumerate(sub_queries)}
+    # Запити виконуються хвилями по SERP_CONCURRENCY, кожна хвиля має SERP_TIMEOUT
+    serp_deadline = SERP_TIMEOUT * math.ceil(len(sub_queries) / SERP_CONCURRENCY) if sub_queries else 0
+    serp_deadline = budget.remaining(serp_deadline)
+    serp_done = 0
+    try:
+        for future in as_completed(serp_futures, timeout=serp_deadline):
             try:
-                # Стандартні значення за замовчуванням
-                title = url  # URL як заголовок за замовчуванням
-                favicon_url = "/static/default-favicon.png"  # іконка за замовчуванням
-                content = ""
-                
-                # Спроба отримати контент
-                content = parse_page_content(url)
-                
-                # Пропускаємо, якщо контент занадто короткий
-                if len(content.strip()) < 30:
-                    print(f"Занадто короткий контент для {url}")
-                    continue
-                
-                # Спроба отримати заголовок (щоб не блокуватись, використовуємо прості заголовки)
-                try:
-                    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                    response = requests.get(url, headers=headers, timeout=5)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.content, 'html.parser')
-                        if soup.title and soup.title.string:
-                            title = soup.title.string.strip()
-                except Exception as e:
-                    logging.warning(f"Не вдалося отримати заголовок для {url}: {e}")
-                
-                # Спроба отримати іконку
-                try:
-                    favicon_url = get_favicon(url)
-                except Exception as e:
-                    logging.warning(f"Не вдалося отримати іконку для {url}: {e}")
-                
-                # Додаємо контент до загального вмісту для звіту
-                all_content += f"\n\n# {title}\n\n{content}"
-                successful_pages += 1
-                
-                # Зберігаємо в БД
-                try:
-                    # Використовуємо ту саму сесію, що створила new_search
-                    new_page = WebPage(
-                        search_id=search_id, 
-                        url=url, 
-                        title=title, 
-                        icon_url=favicon_url, 
-                        content=content
-                    )
-                    session.add(new_page)
-                    session.commit()
-                except Exception as e:
-                    logging.error(f"Помилка при збереженні в БД для {url}: {e}")
-                
+                search_results = future.result()
             except Exception as e:
-                logging.error(f"Глобальна помилка при обробці {url}: {e}")
+                logging.error(f"Помилка пошуку для підзапиту: {e}")
+                search_results = []
+            
+            new_keys = []
+            for rank, result in enumerate(search_results):
+                key = normalize_url(result['url'])
+                position = (serp_futures[future], rank)
+                if key not in url_positions:
+                    new_keys.append(key)
+                    url_positions[key] = position
+                    original_urls[key] = result['url']
+                else:
+                    url_positions[key] = min(url_positions[key], position)
+            
+            # 3. Спершу беремо сторінки зі спільного кешу, решту одразу віддаємо на завантаження
+            cached_pages.update(load_cached_pages(session, new_keys))
+            for key in new_keys:
+                url = original_urls[key]
+                fresh = is_fresh(cached_pages.get(key))
+                count_cache_lookup('page', fresh)
+                if fresh:
+                    page = dict(cached_pages[key], url=url, cache_key=key, source='cache')
+                    page['fingerprint'] = simhash(page['content'] or '')
+                    pages_by_url[key] = page
+                    budget.add(page)
+                    PAGES_FETCHED.inc(source='cache')
+                elif not budget.is_met():
+                    url_keys[url] = key
+                    pipeline.submit(url)
+            
+            serp_done += 1
+            progress('serp', current=serp_done, total=len(sub_queries))
+    except FutureTimeoutError:
+        logging.warning(f"Не всі підзапити встигли за {serp_deadline} с, продовжуємо з наявними URL")
+    finally:
+        serp_executor.shutdown(wait=False, cancel_futures=True)
+    
+    all_urls = sorted(url_positions, key=url_positions.get)  # порядок: підзапит, потім позиція у видачі
+    logging.info(f"Сторінок з кешу: {len(pages_by_url)}, до завантаження: {len(all_urls) - len(pages_by_url)}")
+    pages_done = len(pages_by_url)
+    progress('pages', current=pages_done, total=len(all_urls))
+    
+    if not budget.is_met():
+        for index, url, page_data in pipeline.as_completed():
+            if page_data:
+                pages_by_url[url_keys[url]] = dict(page_data, cache_key=url_keys[url])
+            budget.add(page_data)
+            pages_done += 1
+            progress('pages', current=pages_done, total=len(all_urls))
+            if budget.is_met():
+                # Матеріалу достатньо: решту завантажень скасовуємо і одразу переходимо до звіту
+                break
+    budget.finish(abandoned=pipeline.pending)
+    pipeline.close()
+    new_search.crawl_budget = budget.to_json()
+    logging.info(f"Бюджет пошуку: зупинка '{budget.stop_reason}', корисних джерел {budget.sources}, "
+                 f"тексту {budget.useful_chars} символів, не дочекались {budget.abandoned} сторінок")
+    
+    # Записуємо в БД у порядку URL, щоб результат не залежав від швидкості сайтів
+    new_pages = []
+    for key in all_urls:
+        page_data = pages_by_url.get(key)
+        if not page_data:
+            continue
+        
+        new_pages.append(page_data)
+    
+    # Дзеркала і передруки однієї статті зберігаємо і передаємо у звіт лише раз
+    new_pages, duplicates = drop_near_duplicates(new_pages)
+    if duplicates:
+        print(f"Відкинуто майже однакових сторінок: {len(duplicates)}")
+    report_sources = [{'title': page['title'], 'content': page['content']} for page in new_pages]
+    successful_pages = len(new_pages)
+    progress('store', pages=successful_pages)
+    save_search_pages(session, search_id, new_pages)
     
     # Відлагоджувальна інформація
     print(f"Успішно оброблено сторінок: {successful_pages} з {len(all_urls)}")
@@ -257,15 +474,16 @@ def perform_deep_search(query, api_key, session):
 2. Спробуйте звичайний (не глибокий) пошук
 3. Перевірте підключення до Інтернету
 """
-        new_search.response = error_message
+        new_search.set_response(error_message)
         session.commit()
         return search_id
     
     # Якщо є контент, генеруємо звіт за допомогою Gemini
+    progress('report', pages=successful_pages)
     if api_key:
-        # Обмежуємо розмір контенту для API
-        max_content_length = 30000
-        trimmed_content = all_content[:max_content_length] if len(all_content) > max_content_length else all_content
+        # Обмежуємо розмір контенту для API: пакуємо в бюджет найрелевантніші шматки з усіх джерел, а не перші 30000 символів
+        with span('context'):
+            trimmed_content = build_context(query, sub_queries, report_sources)
         
         system_prompt = """Ти - DeepScout AI, компактний аналітик.
 
@@ -295,16 +513,17 @@ def perform_deep_search(query, api_key, session):
 Створи компактний звіт з головними фактами."""
         
         try:
-            gemini_report = get_gemini_response(prompt, api_key, detailed=False)
-            new_search.response = gemini_report
+            with span('report'):
+                gemini_report = get_gemini_response(prompt, api_key, detailed=False)
+            new_search.set_response(gemini_report)
         except Exception as e:
             logging.error(f"Помилка при отриманні відповіді Gemini: {e}")
-            new_search.response = f"Сталася помилка при генерації звіту: {str(e)}\n\nЗібраний контент:\n{trimmed_content[:1000]}..."
+            new_search.set_response(f"Сталася помилка при генерації звіту: {str(e)}\n\nЗібраний контент:\n{trimmed_content[:1000]}...")
         
         session.commit()
     else:
         # Якщо API ключ не налаштовано
-        new_search.response = "Помилка: Не налаштовано API key для Gemini. Звіт не може бути згенерований."
+        new_search.set_response("Помилка: Не налаштовано API key для Gemini. Звіт не може бути згенерований.")
         session.commit()
 
     return search_id
\ No newline at end of file
@@ -0,0 +1,119 @@
+import logging
+import os
+from urllib.parse import urlencode, urlparse, parse_qs, urljoin, quote_plus
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from browser_pool import get_browser_pool, open_page, wait_for_page_ready, PAGE_READY_TIMEOUT
+from http_client import http_get
+
+# Порядок бекендів: перший, що повернув результати, перемагає
+SEARCH_BACKENDS = os.environ.get('DEEPSCOUT_SEARCH_BACKENDS', 'html,selenium')
+DDG_HTML_URL = os.environ.get('DEEPSCOUT_DDG_HTML_URL', 'https://html.duckduckgo.com/html/')
+
+class SearchBackend:
+    """Базовий клас бекенду пошуку. search() повертає список {'title', 'url'}."""
+    name = None
+
+    def search(self, query, num_results=10):
+        raise NotImplementedError
+
+def _unwrap_ddg_redirect(href):
+    """Посилання у статичній видачі DDG ведуть через //duckduckgo.com/l/?uddg=<справжній URL>."""
+    parsed = urlparse(urljoin('https://duckduckgo.com/', href))
+    if parsed.path.startswith('/l/'):
+        target = parse_qs(parsed.query).get('uddg')
+        if target:
+            return target[0]
+    return parsed.geturl()
+
+def parse_duckduckgo_html(html, num_results=10):
+    """Розбирає сторінку статичної видачі DuckDuckGo (html.duckduckgo.com) без браузера."""
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    for result in soup.select('div.result'):
+        # Рекламні блоки пропускаємо
+        if 'result--ad' in (result.get('class') or []):
+            continue
+        link = result.select_one('a.result__a')
+        if not link or not link.get('href'):
+            continue
+        title = link.get_text(' ', strip=True)
+        url = _unwrap_ddg_redirect(link['href'])
+        if title and url.startswith(('http://', 'https://')):
+            item = {'title': title, 'url': url}
+            snippet = result.select_one('.result__snippet')
+            if snippet:
+                item['snippet'] = snippet.get_text(' ', strip=True)
+            results.append(item)
+        if len(results) >= num_results:
+            break
+    return results
+
+class DuckDuckGoHTMLBackend(SearchBackend):
+    """Легкий бекенд: один HTTP запит до статичної HTML видачі, без JavaScript."""
+    name = 'html'
+
+    def __init__(self, base_url=DDG_HTML_URL):
+        self.base_url = base_url
+
+    def search(self, query, num_results=10):
+        response = http_get(f"{self.base_url}?{urlencode({'q': query})}", timeout=10)
+        response.raise_for_status()
+        return parse_duckduckgo_html(response.content, num_results)
+
+RESULT_SELECTOR = "article[data-nrn='result']"
+RESULT_LINK_SELECTOR = "article[data-nrn='result'] a[data-testid='result-title-a']"
+
+class SeleniumDuckDuckGoBackend(SearchBackend):
+    """Резервний бекенд: повна JS-версія DuckDuckGo у браузері з пулу."""
+    name = 'selenium'
+
+    def search(self, query, num_results=10):
+        results = []
+        # Беремо "теплий" браузер з пулу замість запуску нового Chrome на кожен запит
+        with get_browser_pool().driver() as driver:
+            search_url = f"https://duckduckgo.com/?q={quote_plus(query)}"
+            open_page(driver, search_url)
+
+            try:
+                # Чекаємо саме на результати видачі, а не фіксований час
+                wait_for_page_ready(driver, selectors=(RESULT_SELECTOR,))
+                link_elements = driver.find_elements(By.CSS_SELECTOR, RESULT_LINK_SELECTOR)
+                if len(link_elements) < num_results:
+                    # Решта результатів довантажується при прокрутці
+                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                    wait_for_page_ready(driver, selectors=(RESULT_SELECTOR,), timeout=PAGE_READY_TIMEOUT / 2)
+                    link_elements = driver.find_elements(By.CSS_SELECTOR, RESULT_LINK_SELECTOR)
+
+                for link in link_elements[:num_results]:
+                    title = link.text.strip()
+                    url = link.get_attribute('href')
+                    if title and url:
+                        results.append({'title': title, 'url': url})
+            except Exception as e:
+                logging.error(f"Помилка при отриманні результатів: {e}")
+
+        return results
+
+BACKEND_CLASSES = {
+    DuckDuckGoHTMLBackend.name: DuckDuckGoHTMLBackend,
+    SeleniumDuckDuckGoBackend.name: SeleniumDuckDuckGoBackend,
+}
+
+_backends = None
+
+def get_search_backends():
+    """Бекенди у порядку з DEEPSCOUT_SEARCH_BACKENDS; невідомі назви ігноруються."""
+    global _backends
+    if _backends is None:
+        names = [name.strip() for name in SEARCH_BACKENDS.split(',') if name.strip()]
+        _backends = [BACKEND_CLASSES[name]() for name in names if name in BACKEND_CLASSES]
+        if not _backends:
+            logging.warning(f"Невідомі бекенди пошуку '{SEARCH_BACKENDS}', використовуємо стандартні")
+            _backends = [DuckDuckGoHTMLBackend(), SeleniumDuckDuckGoBackend()]
+    return _backends
+
+def set_search_backends(backends):
+    """Дозволяє підставити власні бекенди (наприклад, для офлайн-запуску)."""
+    global _backends
+    _backends = list(backends)
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Модулі застосунку лежать у корені проєкту, а не в пакеті
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Налаштування читаються при імпорті модулів: тести працюють з тимчасовою БД
+os.environ.setdefault('DEEPSCOUT_DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault('DEEPSCOUT_GEMINI_CACHE_PERSIST', '0')
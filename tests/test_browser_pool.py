@@ -0,0 +1,68 @@
+import json
+from types import SimpleNamespace
+from selenium.common.exceptions import JavascriptException, SessionNotCreatedException
+import browser_pool
+from browser_pool import wait_for_page_ready, RESOURCE_TIMING_BUFFER_SIZE
+
+class FakeDriver:
+    """Віддає заготовлені результати скрипту готовності; останній повторюється."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append((script, args))
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def test_ready_after_network_quiet():
+    driver = FakeDriver([['interactive', False, 3], ['interactive', True, 5], ['interactive', True, 5]])
+    assert wait_for_page_ready(driver, timeout=2, quiet=0.2)
+    script, args = driver.calls[0]
+    assert 'setResourceTimingBufferSize' in script
+    assert args[1] == RESOURCE_TIMING_BUFFER_SIZE
+
+def test_javascript_errors_are_ignored_while_polling():
+    driver = FakeDriver([JavascriptException('document unloaded'), JavascriptException('navigation'),
+                         ['complete', False, 1]])
+    assert wait_for_page_ready(driver, timeout=2, quiet=0.1)
+
+def test_busy_network_hits_timeout():
+    counter = iter(range(10 ** 6))
+
+    class BusyDriver(FakeDriver):
+        def execute_script(self, script, *args):
+            return ['complete', True, next(counter)]
+
+    assert not wait_for_page_ready(BusyDriver([None]), timeout=0.5, quiet=0.2)
+
+def test_loading_page_is_not_ready():
+    assert not wait_for_page_ready(FakeDriver([['loading', True, 0]]), timeout=0.4, quiet=0)
+
+def test_stale_cached_chromedriver_is_replaced(tmp_path, monkeypatch):
+    cache_file = tmp_path / 'chromedriver.json'
+    stale, fresh = tmp_path / 'stale-driver', tmp_path / 'fresh-driver'
+    stale.write_text(''), fresh.write_text('')
+    monkeypatch.setattr(browser_pool, 'DRIVER_CACHE_FILE', str(cache_file))
+    monkeypatch.setattr(browser_pool, 'CHROMEDRIVER_PATH', None)
+    monkeypatch.setattr(browser_pool, 'BLOCK_HEAVY_RESOURCES', False)
+    monkeypatch.setattr(browser_pool, 'ChromeDriverManager', lambda: SimpleNamespace(install=lambda: str(fresh)))
+    browser_pool.invalidate_chromedriver()
+    cache_file.write_text(json.dumps({'path': str(stale)}))
+
+    started = []
+
+    def fake_chrome(service, options):
+        started.append(service.path)
+        if service.path == str(stale):
+            raise SessionNotCreatedException('This version of ChromeDriver only supports Chrome version 120')
+        return SimpleNamespace(set_page_load_timeout=lambda timeout: None)
+
+    monkeypatch.setattr(browser_pool.webdriver, 'Chrome', fake_chrome)
+    browser_pool.create_driver()
+    assert started == [str(stale), str(fresh)]
+    assert json.loads(cache_file.read_text()) == {'path': str(fresh)}
+    browser_pool.invalidate_chromedriver()
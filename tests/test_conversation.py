@@ -0,0 +1,45 @@
+import conversation
+import database
+from conversation import completed_turns, format_turns, build_conversation_context, CONTEXT_TURNS
+
+def message(role, content):
+    return {'role': role, 'content': content}
+
+def test_unanswered_questions_are_skipped():
+    messages = [
+        message('user', 'q1'), message('assistant', 'a1'),
+        message('user', 'orphan'),
+        message('user', 'q2'), message('assistant', 'a2'),
+    ]
+    assert [m['content'] for m in completed_turns(messages)] == ['q1', 'a1', 'q2', 'a2']
+    assert format_turns(messages) == "Запитання: q1\nВідповідь: a1\n\nЗапитання: q2\nВідповідь: a2\n\n"
+
+def test_trailing_question_is_not_a_turn():
+    assert format_turns([message('user', 'q1'), message('assistant', 'a1'), message('user', 'q2')]) == \
+        "Запитання: q1\nВідповідь: a1\n\n"
+
+def test_summary_is_updated_in_batches(monkeypatch):
+    database.create_tables()
+    calls = []
+
+    def fake_summarize(previous_summary, messages, api_key):
+        calls.append(len(messages) // 2)
+        return f"підсумок {len(calls)}"
+
+    monkeypatch.setattr(conversation, '_summarize', fake_summarize)
+    with database.get_session() as session:
+        search = database.Search(query='пакетний підсумок', search_type='shallow')
+        session.add(search)
+        session.commit()
+        history = []
+        verbatim = []
+        for turn in range(1, 3 * CONTEXT_TURNS + 1):
+            history += [message('user', f'q{turn}'), message('assistant', f'a{turn}')]
+            context = build_conversation_context(session, search.id, history, 'key')
+            verbatim.append(context.count('Запитання:'))
+
+    # Gemini викликається раз на CONTEXT_TURNS запитань, кожного разу з CONTEXT_TURNS парами
+    assert calls == [CONTEXT_TURNS, CONTEXT_TURNS]
+    assert all(count <= 2 * CONTEXT_TURNS for count in verbatim)
+    assert context.startswith("Підсумок попередньої розмови:\nпідсумок 2")
+    assert verbatim[-1] == CONTEXT_TURNS
@@ -0,0 +1,20 @@
+import database
+import utils
+from favicon_cache import get_cached_favicon
+
+def test_unreachable_page_caches_failure_without_probing_host(monkeypatch):
+    database.create_tables()
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError('host is down')
+
+    probes = []
+    monkeypatch.setattr(utils, 'http_stream', unreachable)
+    monkeypatch.setattr(utils, 'get_selenium_page_source', unreachable)
+    monkeypatch.setattr(utils, 'http_head', lambda *args, **kwargs: probes.append(args))
+
+    page = utils.process_page('http://dead.example/article')
+    assert page['source'] == 'fallback'
+    assert page['icon_url'] == utils.DEFAULT_FAVICON
+    assert probes == []
+    assert get_cached_favicon('http://dead.example/other') == (True, None)
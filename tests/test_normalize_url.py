@@ -0,0 +1,14 @@
+from utils import normalize_url
+
+def test_tracking_params_port_and_fragment_are_dropped():
+    assert normalize_url('HTTPS://Example.COM:443/a?utm_source=x&gclid=1&q=2#top') == 'https://example.com/a?q=2'
+    assert normalize_url('http://example.com:8080') == 'http://example.com:8080/'
+
+def test_meaningful_params_are_kept():
+    assert normalize_url('https://github.com/o/r/blob/x.py?ref=main') == 'https://github.com/o/r/blob/x.py?ref=main'
+
+def test_ipv6_host_keeps_brackets():
+    assert normalize_url('http://[::1]:8000/page') == 'http://[::1]:8000/page'
+
+def test_invalid_port_does_not_raise():
+    assert normalize_url(' http://example.com:99999/x ') == 'http://example.com:99999/x'
@@ -0,0 +1,61 @@
+import os
+import pytest
+from search_backends import parse_duckduckgo_html, _unwrap_ddg_redirect
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'duckduckgo')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+@pytest.fixture
+def results_page():
+    return load_fixture('results.html')
+
+def test_ads_are_skipped(results_page):
+    results = parse_duckduckgo_html(results_page, num_results=50)
+    assert all('ads.example' not in result['url'] for result in results)
+    assert all('Sponsored' not in result['title'] for result in results)
+    assert results[0] == {
+        'title': 'Welcome to Python.org',
+        'url': 'https://www.python.org/',
+        'snippet': 'The official home of the Python Programming Language.',
+    }
+
+def test_redirect_links_are_unwrapped(results_page):
+    urls = [result['url'] for result in parse_duckduckgo_html(results_page, num_results=50)]
+    assert all('duckduckgo.com/l/' not in url for url in urls)
+    # Параметри і фрагмент справжнього URL зберігаються після розкодування uddg
+    assert 'https://docs.python.org/3/tutorial/index.html?highlight=tutorial&lang=en' in urls
+    assert 'https://docs.python.org/3/whatsnew/3.12.html#summary' in urls
+    # Пряме посилання без редиректу лишається як є
+    assert 'https://www.learnpython.org/' in urls
+
+def test_non_http_links_are_skipped(results_page):
+    results = parse_duckduckgo_html(results_page, num_results=50)
+    assert 'Broken result' not in [result['title'] for result in results]
+    assert len(results) == 11
+
+def test_results_are_capped(results_page):
+    results = parse_duckduckgo_html(results_page, num_results=5)
+    assert len(results) == 5
+    assert [result['url'] for result in results] == [
+        'https://www.python.org/',
+        'https://en.wikipedia.org/wiki/Python_(programming_language)',
+        'https://docs.python.org/3/tutorial/index.html?highlight=tutorial&lang=en',
+        'https://www.learnpython.org/',
+        'https://www.w3schools.com/python/',
+    ]
+
+@pytest.mark.parametrize('name', ['no_results.html', 'blocked.html'])
+def test_empty_or_blocked_page_returns_nothing(name):
+    assert parse_duckduckgo_html(load_fixture(name)) == []
+
+@pytest.mark.parametrize('html', [b'', '', '<html><body></body></html>'])
+def test_empty_document_returns_nothing(html):
+    assert parse_duckduckgo_html(html) == []
+
+def test_unwrap_keeps_plain_links():
+    assert _unwrap_ddg_redirect('https://example.com/page') == 'https://example.com/page'
+    assert _unwrap_ddg_redirect('//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fa%3Fb%3D1') == \
+        'https://example.com/a?b=1'
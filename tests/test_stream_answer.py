@@ -0,0 +1,56 @@
+import re
+import pytest
+import app as app_module
+import database
+from gemini_client import set_gemini_client, reset_gemini_client
+from conversation import load_messages
+
+ANSWER_CHUNKS = [f"Частина {i} відповіді. " for i in range(10)]
+
+class FakeStreamingClient:
+    api_key = 'test-key'
+
+    def generate(self, prompt):
+        return ''.join(ANSWER_CHUNKS)
+
+    def generate_stream(self, prompt):
+        yield from ANSWER_CHUNKS
+
+@pytest.fixture
+def client(monkeypatch):
+    database.create_tables()
+    set_gemini_client(FakeStreamingClient())
+    monkeypatch.setattr(app_module, 'GOOGLE_API_KEY', FakeStreamingClient.api_key)
+    yield app_module.app.test_client()
+    reset_gemini_client()
+
+def start_search(client, query):
+    html = client.post('/search', data={'query': query, 'search_type': 'shallow', 'stream': '1'}).get_data(as_text=True)
+    return re.search(r'data-stream-url="([^"]+)"', html).group(1).replace('&amp;', '&')
+
+def saved_answer(stream_url):
+    search_id = int(re.search(r'/stream/(\d+)', stream_url).group(1))
+    with database.get_session() as session:
+        search = session.query(database.Search).get(search_id)
+        messages = load_messages(session, search)
+        return messages[-1], search.response
+
+def test_disconnect_saves_complete_answer(client):
+    stream_url = start_search(client, 'обрив потоку')
+    response = client.get(stream_url, buffered=False)
+    body = iter(response.response)
+    next(body), next(body)  # клієнт отримав дві частини і відключився
+    response.close()
+
+    message, search_response = saved_answer(stream_url)
+    full_answer = ''.join(ANSWER_CHUNKS).strip()
+    assert message['role'] == 'assistant'
+    assert message['content'] == full_answer
+    assert search_response == full_answer
+
+def test_replayed_stream_returns_saved_answer(client):
+    stream_url = start_search(client, 'повторне підключення')
+    first = client.get(stream_url).get_data(as_text=True)
+    assert first.count('data:') == len(ANSWER_CHUNKS) + 1
+    replay = client.get(stream_url).get_data(as_text=True)
+    assert replay.startswith('event: done')
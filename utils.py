@@ -1,150 +1,292 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+import io
+import logging
+import os
+from browser_pool import get_browser_pool, open_page, wait_for_page_ready, PAGE_READY_TIMEOUT
+from http_client import http_get, http_head, http_stream, iter_body, content_type_of, content_length_of
+from page_cache import conditional_headers
+from favicon_cache import get_cached_favicon, store_favicon, origin_of
+from extractor import extract, extract_stream, detect_encoding
+from metrics import span
 
-def get_favicon(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-    }
-    
-    try:
-        response = requests.get(url, timeout=10, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+try:
+    from pypdf import PdfReader
+except ImportError:  # pypdf необов'язковий: без нього PDF пропускаються
+    PdfReader = None
 
-        icon_link = soup.find("link", rel="icon") or \
-                    soup.find("link", rel="shortcut icon") or \
-                    soup.find("link", rel="apple-touch-icon")
+DEFAULT_FAVICON = "/static/default-favicon.png"
+
+# Типи вмісту, з яких витягуємо текст; решта (зображення, відео, архіви...) пропускається
+# до читання тіла. Відповідь без Content-Type вважаємо HTML.
+HTML_TYPES = {'', 'text/html', 'application/xhtml+xml'}
+TEXT_TYPES = {'text/plain', 'text/markdown', 'text/x-markdown'}
+PDF_TYPES = {'application/pdf'}
+# PDF не можна розібрати частково, тому більший файл не завантажуємо взагалі
+MAX_PDF_BYTES = int(os.environ.get('DEEPSCOUT_MAX_PDF_BYTES', 10 * 1024 * 1024))
+
+# Параметри, які додають трекери і які не змінюють вміст сторінки
+TRACKING_PARAMS = {'gclid', 'fbclid', 'yclid', 'msclkid', 'dclid', 'igshid', 'mc_cid', 'mc_eid',
+                   '_ga', '_gl', 'ref_src', 'spm', 'srsltid'}
+
+def normalize_url(url):
+    """
+    Ключ URL для дедуплікації і кешу сторінок: нижній регістр схеми і хоста,
+    без стандартного порту, фрагмента (#...) та трекінгових параметрів (utm_*, gclid, ...).
+    Лише ключ: завантажується і зберігається початковий URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6
+    try:
+        port = parts.port
+    except ValueError:
+        # Некоректний порт: такий URL не канонізуємо, ключем буде він сам
+        return url.strip()
+    if port and not (scheme == 'http' and port == 80) and not (scheme == 'https' and port == 443):
+        host = f"{host}:{port}"
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS])
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
 
-        if icon_link and icon_link.get('href'):
-            favicon_url = icon_link['href']
-            favicon_url = urljoin(url, favicon_url)
+@span('favicon')
+def fallback_favicon(url):
+    """Іконка для сторінок без <link rel="icon">: /favicon.ico або сервіс Google."""
+    favicon_url = urljoin(url, '/favicon.ico')
+    try:
+        test_response = http_head(favicon_url, timeout=5)
+        if test_response.status_code == 200:
             return favicon_url
+    except:
+        pass
+
+    return f"https://www.google.com/s2/favicons?domain={origin_of(url)}"
 
-        favicon_url = urljoin(url, '/favicon.ico')
-        try:
-            test_response = requests.head(favicon_url, timeout=5, headers=headers)
-            if test_response.status_code == 200:
-                return favicon_url
-        except:
-            pass
+def resolve_favicon(url, icon_link=None):
+    """
+    Іконка сторінки з урахуванням кешу за доменом.
+    icon_link - абсолютне посилання з <link rel="icon">, якщо сторінку вже розібрано.
+    Для вже відомого домену мережеві запити не виконуються.
+    """
+    hit, icon_url = get_cached_favicon(url)
+    if hit:
+        return icon_url or DEFAULT_FAVICON
 
-        return f"https://www.google.com/s2/favicons?domain={url}"
+    icon_url = icon_link or fallback_favicon(url)
+    store_favicon(url, icon_url)
+    return icon_url
+
+def cached_or_default_favicon(url):
+    """
+    Іконка для сторінки, яку не вдалося завантажити: лише з кешу, без запитів до хоста,
+    що щойно не відповів. Інакше кешуємо невдачу (на FAVICON_NEGATIVE_TTL) і повертаємо
+    іконку за замовчуванням.
+    """
+    hit, icon_url = get_cached_favicon(url)
+    if hit:
+        return icon_url or DEFAULT_FAVICON
+    store_favicon(url, None)
+    return DEFAULT_FAVICON
+
+def get_favicon(url):
+    hit, icon_url = get_cached_favicon(url)
+    if hit:
+        return icon_url or DEFAULT_FAVICON
+
+    try:
+        response = http_get(url, timeout=10)
+        response.raise_for_status()
+        return resolve_favicon(url, extract(response.content, url)['icon_link'])
 
     except requests.exceptions.RequestException as e:
         print(f"Помилка при отриманні іконки для {url}: {e}")
-        return "/static/default-favicon.png"
+        store_favicon(url, None)
+        return DEFAULT_FAVICON
     except Exception as e:
         print(f"Інша помилка при отриманні іконки: {e}")
-        return "/static/default-favicon.png"
+        return DEFAULT_FAVICON
 
-def parse_page_content(url):
+def _read_pdf(url, response, cancelled=None):
+    length = content_length_of(response)
+    if PdfReader is None or (length and length > MAX_PDF_BYTES):
+        return None
+    body = b''.join(iter_body(response, MAX_PDF_BYTES + 1, cancelled))
+    if len(body) > MAX_PDF_BYTES:
+        return None
+    reader = PdfReader(io.BytesIO(body))
+    content = '\n'.join(text for text in (page.extract_text() or '' for page in reader.pages) if text.strip())
+    title = reader.metadata.title if reader.metadata else None
+    return {'content': content, 'title': title, 'icon_link': None}
+
+def read_page_response(url, response, cancelled=None):
     """
-    Покращена функція для отримання контенту сторінки з різними методами завантаження.
-    Спочатку пробує через requests, якщо не виходить - через selenium.
+    Читає відкриту потокову відповідь залежно від Content-Type.
+    HTML декодується і розбирається шматками по мірі завантаження, тож документ
+    не буферизується цілком і обрізається на MAX_BODY_BYTES. Повертає (тип, сторінка),
+    де тип - 'html', 'text' або 'pdf', а сторінка - {'content', 'title', 'icon_link'};
+    для типів без тексту - (mime, None), і тіло відповіді не читається.
+    Встановлена подія cancelled обриває читання тіла (див. iter_body).
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'uk-UA,uk;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Cache-Control': 'max-age=0',
-        'Referer': 'https://www.google.com/'
-    }
-    
+    mime, charset = content_type_of(response)
+    if mime in HTML_TYPES:
+        return 'html', extract_stream(iter_body(response, cancelled=cancelled), url, encoding=charset)
+    if mime in TEXT_TYPES:
+        body = b''.join(iter_body(response, cancelled=cancelled))
+        return 'text', {'content': body.decode(detect_encoding(body[:4096], charset), errors='replace'),
+                        'title': None, 'icon_link': None}
+    if mime in PDF_TYPES:
+        return 'pdf', _read_pdf(url, response, cancelled)
+    return mime, None
+
+def process_page(url, cached=None, cancelled=None):
+    """
+    Обробляє сторінку за одне завантаження: з однієї HTTP відповіді і одного
+    розбору HTML отримуємо контент, заголовок та іконку.
+    Якщо передано запис кешу (cached), робимо умовний GET і при 304 повертаємо його.
+    Якщо через requests контент HTML сторінки отримати не вдалося - пробуємо selenium.
+    Вміст, з якого текст не витягується (зображення, відео, архіви, завеликі PDF),
+    пропускається одразу за заголовками відповіді, без завантаження тіла.
+    cancelled - необов'язкова threading.Event: після її встановлення читання сторінки
+    обривається, а резервне завантаження через selenium не починається (source 'cancelled').
+    Повертає словник з ключами content, title, icon_url, etag, last_modified та
+    source ('requests', 'selenium', 'revalidated', 'skipped', 'cancelled' або 'fallback').
+    """
+    title = None
+    icon_url = None
+
     # Пробуємо через requests
     try:
-        response = requests.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        content = extract_text_from_html(response.content)
-        
-        # Якщо контент не порожній, повертаємо його
-        if content and len(content.strip()) > 50:
-            return content
+        # span fetch охоплює і розбір: HTML розбирається по мірі завантаження
+        with span('fetch'), http_stream(url, timeout=15, headers=conditional_headers(cached)) as response:
+            if response.status_code == 304 and cached:
+                return dict(cached, source='revalidated')
+            response.raise_for_status()
+            # Текст, заголовок і посилання на іконку - за один прохід парсера
+            kind, page = read_page_response(url, response, cancelled)
+
+        if page is None:
+            logging.info(f"Пропускаємо {url}: вміст типу '{kind}' не містить тексту або завеликий")
+            return {
+                'content': '',
+                'title': url,
+                'icon_url': DEFAULT_FAVICON,
+                'etag': None,
+                'last_modified': None,
+                'source': 'skipped'
+            }
+        title = page['title']
+        icon_url = resolve_favicon(url, page['icon_link'])
+        content = page['content']
+
+        # Якщо контент не порожній (або це не HTML, для якого браузер не допоможе), повертаємо його
+        if kind != 'html' or (content and len(content.strip()) > 50):
+            return {
+                'content': content,
+                'title': title or url,
+                'icon_url': icon_url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'source': 'requests'
+            }
     except Exception as e:
         print(f"Не вдалося отримати контент через requests для {url}: {e}")
-    
+
+    # Пошук уже має достатньо матеріалу - браузер не запускаємо
+    if cancelled is not None and cancelled.is_set():
+        return {
+            'content': '',
+            'title': title or url,
+            'icon_url': icon_url or DEFAULT_FAVICON,
+            'etag': None,
+            'last_modified': None,
+            'source': 'cancelled'
+        }
+
     # Якщо requests не спрацював, використовуємо selenium
     try:
-        content = parse_with_selenium(url)
-        return content
+        with span('selenium'):
+            page = extract(get_selenium_page_source(url), url)
+        title = title or page['title']
+        icon_url = icon_url or resolve_favicon(url, page['icon_link'])
+        content = page['content']
+        source = 'selenium'
     except Exception as e:
         print(f"Не вдалося отримати контент через selenium для {url}: {e}")
-    
-    # Фоллбек - повертаємо хоч якусь інформацію
-    return f"Інформація з {url} недоступна через обмеження сайту. URL: {url}"
+        # Фоллбек - повертаємо хоч якусь інформацію
+        content = f"Інформація з {url} недоступна через обмеження сайту. URL: {url}"
+        source = 'fallback'
+
+    return {
+        'content': content,
+        'title': title or url,
+        # Сюди без іконки доходимо лише коли хост не відповів - повторно його не опитуємо
+        'icon_url': icon_url or cached_or_default_favicon(url),
+        'etag': None,
+        'last_modified': None,
+        'source': source
+    }
+
+def parse_page_content(url):
+    """
+    Покращена функція для отримання контенту сторінки з різними методами завантаження.
+    Спочатку пробує через requests, якщо не виходить - через selenium.
+    """
+    return process_page(url)['content']
 
 def extract_text_from_html(html_content):
-    """Покращений екстрактор тексту з HTML."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+    """Покращений екстрактор тексту з HTML (однопрохідний, див. extractor.py)."""
+    return extract(html_content)['content']
+
+def extract_text_from_soup(soup):
+    """
+    Попередній екстрактор на BeautifulSoup; залишений як еталон для
+    benchmarks/extraction_benchmark.py. Увага: змінює переданий soup.
+    """
     # Видаляємо всі скрипти, стилі та інші непотрібні елементи
     for element in soup(['script', 'style', 'head', 'header', 'footer', 'nav']):
         element.extract()
-    
+
     # Спроба 1: Шукаємо основний контент за поширеними класами
-    main_content = soup.find(['main', 'article', 'div'], 
-                            class_=['content', 'main-content', 'article-content', 'post-content', 
+    main_content = soup.find(['main', 'article', 'div'],
+                            class_=['content', 'main-content', 'article-content', 'post-content',
                                     'entry-content', 'page-content', 'main'])
-    
+
     if main_content:
         return main_content.get_text(separator='\n', strip=True)
-    
+
     # Спроба 2: Шукаємо всі абзаци
     paragraphs = soup.find_all('p')
     if paragraphs:
         text = '\n\n'.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
         if len(text) > 100:
             return text
-    
+
     # Спроба 3: Беремо весь текст з body
     body = soup.find('body')
     if body:
         return body.get_text(separator='\n', strip=True)
-    
+
     # Якщо нічого не знайдено, повертаємо весь текст
     return soup.get_text(separator='\n', strip=True)
 
-def parse_with_selenium(url):
-    """Отримання контенту за допомогою Selenium, що може обійти захист від скрапінгу."""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
-    try:
-        driver.get(url)
-        # Чекаємо, щоб сторінка завантажилась
-        time.sleep(3)
-        
-        # Скролимо, щоб завантажити ліниве завантаження
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-        time.sleep(1)
+def get_selenium_page_source(url):
+    """Завантажує сторінку в браузері з пулу і повертає її HTML."""
+    # Браузер позичаємо з пулу; зламаний браузер пул сам закриє і замінить
+    with get_browser_pool().driver() as driver:
+        open_page(driver, url)
+        # Чекаємо готовності сторінки явно, а не фіксованими паузами
+        wait_for_page_ready(driver)
+
+        # Скролимо, щоб запустити ліниве завантаження, і чекаємо, поки мережа затихне
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
-        
+        wait_for_page_ready(driver, timeout=PAGE_READY_TIMEOUT / 2)
+
         # Отримуємо весь контент сторінки
-        page_source = driver.page_source
-        driver.quit()
-        
-        # Обробляємо отриманий HTML
-        return extract_text_from_html(page_source)
-    except Exception as e:
-        if driver:
-            driver.quit()
-        raise e
\ No newline at end of file
+        return driver.page_source
+
+def parse_with_selenium(url):
+    """Отримання контенту за допомогою Selenium, що може обійти захист від скрапінгу."""
+    # Обробляємо отриманий HTML
+    return extract_text_from_html(get_selenium_page_source(url))